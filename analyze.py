@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Set, Tuple
+
+from game_tree import GameTree
+from notation import parse_position, to_notation
+from parallel_search import imap_unordered
+from pieces import unpack_move
+
+# GameTree of a worker process, kept between positions so its tables stay warm
+_worker_tree = None
+
+def _init_worker(tree_kwargs):
+    global _worker_tree
+    _worker_tree = GameTree(**tree_kwargs)
+
+def move_to_json(packed_move) -> dict:
+    position, move = unpack_move(packed_move)
+    return {"from": list(position), "to": list(move.position if move.is_position_new else position),
+            "rotation": move.rotation.name, "swap": move.is_swap}
+
+def analyze_position(task) -> dict:
+    """
+    Worker: search the position on one line of the input and return its JSON result
+    """
+    index, line, depth, time_limit, max_nodes = task
+    try:
+        board = parse_position(line)
+    except ValueError as e:
+        return {"index": index, "error": str(e)}
+
+    start = time.perf_counter()
+    try:
+        result = _worker_tree.search(board, depth, time_limit=time_limit, max_nodes=max_nodes)
+    except ValueError as e:
+        # A position the move generator rejects, one bad line shouldn't stop the whole run
+        return {"index": index, "error": str(e)}
+    return {
+        "index": index,
+        "position": to_notation(board),
+        "best_move": move_to_json(result.pv[0]) if result.pv else None,
+        "pv": result.pv,
+        "score": result.score,
+        "depth": result.depth,
+        "nodes": result.nodes,
+        "seconds": time.perf_counter() - start,
+        "stopped": result.stopped,
+    }
+
+def read_lines(path) -> Iterator[Tuple[int, str]]:
+    """
+    (line number from 0, line) of every position line of path, lazily. Blank lines and # comments are skipped
+    but still counted, so indices stay stable when the file is read again
+    """
+    with open(path) as f:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield index, line
+
+def completed_indices(path) -> Set[int]:
+    """
+    Indices already in an output file. A line cut off by an interrupted run is ignored and written again
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["index"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+def analyze_file(input_path, output_path, depth=None, time_limit=None, max_nodes=None, workers=None, resume=False,
+                 verbose=False, **tree_kwargs) -> int:
+    """
+    Search every position of input_path (text notation or config lists, one per line) under the given budget and
+    write one JSON line per position to output_path as results come in. Results are in completion order and carry
+    the index of their input line.
+    resume: keep output_path and skip the positions it already has, instead of starting it over.
+    Returns the number of positions analysed
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    done = completed_indices(output_path) if resume else set()
+    tasks = ((index, line, depth, time_limit, max_nodes) for index, line in read_lines(input_path) if index not in done)
+
+    n_analysed = 0
+    with open(output_path, "a" if resume else "w") as f:
+        if resume and f.tell():
+            # Make sure a line cut off by an interrupted run doesn't swallow the next result
+            with open(output_path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    f.write("\n")
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(tree_kwargs,)) if workers > 1 else None
+        try:
+            if executor is None:
+                _init_worker(tree_kwargs)
+                results = map(analyze_position, tasks)
+            else:
+                results = imap_unordered(executor, analyze_position, tasks, 2 * workers)
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                n_analysed += 1
+                if verbose:
+                    print(f"{n_analysed} positions analysed", file=sys.stderr)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    return n_analysed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search every position of a file and write the results as JSON lines")
+    parser.add_argument("input", help="one position per line, in text notation or as a config list")
+    parser.add_argument("output", help="JSON lines file to write")
+    parser.add_argument("--depth", type=int, help="search depth per position")
+    parser.add_argument("--time-limit", type=float, help="search time limit per position in seconds")
+    parser.add_argument("--max-nodes", type=int, help="node limit per position")
+    parser.add_argument("--workers", type=int, help="worker processes, one per CPU by default")
+    parser.add_argument("--resume", action="store_true", help="skip positions already in the output file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    n_analysed = analyze_file(args.input, args.output, args.depth, args.time_limit, args.max_nodes, args.workers,
+                              args.resume, args.verbose)
+    print(f"Analysed {n_analysed} positions", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
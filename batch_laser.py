@@ -0,0 +1,115 @@
+import numpy as np
+
+from pieces import (ELIMINATED, NO_DIRECTION, PIECE_SHIFT, REFLECTION_TABLE, ROTATION_MASK, ROTATION_SHIFT, SQUARE_MASK,
+                    TO_SHIFT, PieceColor, Rotation)
+
+N_SQUARES = 80
+# Laser start squares, indexed like the board codes. board.py takes these and N_SQUARES from here
+RED_LASER_SQUARE = 0
+SILVER_LASER_SQUARE = 79
+
+# NEXT_SQUARE[idx, direction] is the square one step from idx in a laser direction (Rotation value), -1 when that
+# leaves the board or the direction is diagonal
+NEXT_SQUARE = np.full((N_SQUARES, 8), -1, dtype=np.int16)
+for _direction, (_dr, _dc) in ((Rotation.N, (-1, 0)), (Rotation.E, (0, 1)), (Rotation.S, (1, 0)), (Rotation.W, (0, -1))):
+    for _idx in range(N_SQUARES):
+        _r, _c = divmod(_idx, 10)
+        if 0 <= _r + _dr < 8 and 0 <= _c + _dc < 10:
+            NEXT_SQUARE[_idx, _direction.value] = (_r + _dr) * 10 + _c + _dc
+
+# REFLECTION_TABLE flattened by square code: LASER_ELIMINATES[code, direction] is True when a laser travelling in
+# direction eliminates the piece, LASER_NEXT_DIRECTION[code, direction] is the reflected direction or NO_DIRECTION.
+# LASER_INVALID marks combinations the rules don't allow (e.g. a pyramid facing N)
+LASER_ELIMINATES = np.zeros((128, 8), dtype=bool)
+LASER_NEXT_DIRECTION = np.full((128, 8), NO_DIRECTION, dtype=np.int8)
+LASER_INVALID = np.zeros((128, 8), dtype=bool)
+for _code in range(1, 128):
+    _piece = _code >> PIECE_SHIFT
+    if not 1 <= _piece <= 5:
+        continue
+    for _direction in (Rotation.N, Rotation.E, Rotation.S, Rotation.W):
+        _outcome = REFLECTION_TABLE[_piece][_code & ROTATION_MASK][_direction.value]
+        if _outcome is None:
+            LASER_INVALID[_code, _direction.value] = True
+        else:
+            LASER_ELIMINATES[_code, _direction.value] = _outcome[0] == ELIMINATED
+            LASER_NEXT_DIRECTION[_code, _direction.value] = _outcome[1]
+
+# A laser can cross every square at most once per direction
+MAX_LASER_STEPS = 4 * N_SQUARES
+
+def fire_lasers(stack, colors, out_paths=None) -> np.ndarray:
+    """
+    Fire the laser on every board of a (N, 8, 10) stack of square codes in lockstep.
+    colors: the PieceColor firing, for all boards, or an array of PieceColor values (-1 red, 1 silver) per board
+    out_paths: an (N, N_SQUARES) bool array. If given, the squares each laser passes over are set in it, like
+        threats.laser_path_mask: the sphinx, then every square up to the piece that stops the laser or the edge
+    Returns an int array with the square index of the piece each laser eliminates, -1 where nothing is hit.
+    The stack is not modified
+    """
+    flat = np.asarray(stack).reshape(-1, N_SQUARES)
+    n_boards = len(flat)
+    if isinstance(colors, PieceColor):
+        colors = np.full(n_boards, colors.value)
+    squares = np.where(np.asarray(colors) == PieceColor.SILVER.value, SILVER_LASER_SQUARE, RED_LASER_SQUARE)
+    directions = (flat[np.arange(n_boards), squares] & ROTATION_MASK).astype(np.intp)
+    eliminated = np.full(n_boards, -1, dtype=np.int64)
+    if out_paths is not None:
+        out_paths[np.arange(n_boards), squares] = True
+
+    # Boards whose laser is still travelling
+    active = np.arange(n_boards)
+    squares = squares.astype(np.intp)
+    for _ in range(MAX_LASER_STEPS):
+        if not len(active):
+            break
+        next_squares = NEXT_SQUARE[squares, directions]
+        on_board = next_squares >= 0
+        active, squares, directions = active[on_board], next_squares[on_board].astype(np.intp), directions[on_board]
+        if out_paths is not None:
+            out_paths[active, squares] = True
+
+        codes = flat[active, squares]
+        hit = codes != 0
+        if not hit.any():
+            continue
+        hit_codes, hit_directions = codes[hit], directions[hit]
+        if LASER_INVALID[hit_codes, hit_directions].any():
+            raise ValueError("Laser hit a piece with an invalid rotation")
+
+        eliminates = LASER_ELIMINATES[hit_codes, hit_directions]
+        hit_active = active[hit]
+        eliminated[hit_active[eliminates]] = squares[hit][eliminates]
+
+        new_directions = LASER_NEXT_DIRECTION[hit_codes, hit_directions]
+        directions[hit] = new_directions
+        keep = np.ones(len(active), dtype=bool)
+        keep[np.flatnonzero(hit)] = ~eliminates & (new_directions != NO_DIRECTION)
+        active, squares, directions = active[keep], squares[keep], directions[keep]
+
+    return eliminated
+
+def apply_moves(squares, moves, color):
+    """
+    Apply each packed move to a copy of squares (one board's n_squares square codes) and fire color's laser on all
+    of them at once.
+    Returns the (N, 8, 10) uint8 stack of resulting square codes, eliminated pieces removed, and the square index
+    each laser eliminated (-1 for none)
+    """
+    moves = np.asarray(moves, dtype=np.int64)
+    n_moves = len(moves)
+    stack = np.tile(np.frombuffer(bytes(squares), dtype=np.uint8), (n_moves, 1))
+    rows = np.arange(n_moves)
+    from_idx = moves & SQUARE_MASK
+    to_idx = (moves >> TO_SHIFT) & SQUARE_MASK
+    from_codes = stack[rows, from_idx]
+    to_codes = stack[rows, to_idx]
+    swaps = (from_idx != to_idx) & (to_codes != 0)
+
+    stack[rows, from_idx] = np.where(swaps, to_codes, 0)
+    stack[rows, to_idx] = (from_codes & ~np.uint8(ROTATION_MASK)) | ((moves >> ROTATION_SHIFT) & ROTATION_MASK)
+
+    eliminated = fire_lasers(stack, color)
+    hit = eliminated >= 0
+    stack[rows[hit], eliminated[hit]] = 0
+    return stack.reshape(n_moves, 8, 10), eliminated
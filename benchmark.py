@@ -0,0 +1,166 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from batch_laser import fire_lasers
+from game_tree import GameTree
+from pieces import PHAROAH_CODE, PieceColor, ROTATION_MASK, SILVER_BIT
+from positions import get_benchmark_positions
+from search_stats import SearchStats
+
+# Known perft counts by depth, used as a correctness check of move generation and the laser rules
+EXPECTED_PERFT = {
+    "classic": [1, 77, 5917, 450981],
+    "midgame_16": [1, 49, 3324, 152423],
+    "midgame_30": [1, 49, 3145, 156076],
+    "midgame_50": [1, 70, 4560, 318812],
+}
+
+def perft(board, depth) -> int:
+    """
+    Number of leaf positions depth plies below board. A move that eliminates a Pharoah ends the game,
+    so its position is a leaf
+    """
+    if depth == 0:
+        return 1
+    count = 0
+    for move in board.generate_moves():
+        eliminated_code = board.make_packed_move(move)
+        if depth == 1 or eliminated_code & ~(SILVER_BIT | ROTATION_MASK) == PHAROAH_CODE:
+            count += 1
+        else:
+            count += perft(board, depth - 1)
+        board.unmake_move()
+    return count
+
+def bench_perft(name, board, max_depth):
+    results = []
+    expected = EXPECTED_PERFT.get(name, [])
+    for depth in range(1, max_depth + 1):
+        start = time.perf_counter()
+        count = perft(board, depth)
+        elapsed = time.perf_counter() - start
+        result = {"position": name, "benchmark": "perft", "depth": depth, "nodes": count, "seconds": elapsed,
+                  "nodes_per_second": count / elapsed if elapsed else None}
+        if depth < len(expected):
+            result["expected"] = expected[depth]
+            result["ok"] = count == expected[depth]
+        results.append(result)
+    return results
+
+def bench_make_move(name, board, min_seconds):
+    """
+    make_packed_move + unmake_move pairs per second over every move of the position
+    """
+    moves = board.generate_moves()
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for move in moves:
+            board.make_packed_move(move)
+            board.unmake_move()
+        count += len(moves)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    return {"position": name, "benchmark": "make_unmake", "moves": count, "seconds": elapsed,
+            "per_second": count / elapsed}
+
+def bench_laser(name, board, min_seconds, batch_size):
+    """
+    Laser traces per second, one board at a time and for a stack of batch_size copies
+    """
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(1000):
+            board._fire_laser(PieceColor.RED)
+            board._fire_laser(PieceColor.SILVER)
+        count += 2000
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    results = [{"position": name, "benchmark": "laser", "traces": count, "seconds": elapsed,
+                "per_second": count / elapsed}]
+
+    stack = np.repeat(board.board_config[np.newaxis], batch_size, axis=0)
+    colors = np.where(np.arange(batch_size) % 2 == 0, PieceColor.RED.value, PieceColor.SILVER.value)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fire_lasers(stack, colors)
+        count += batch_size
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    results.append({"position": name, "benchmark": "batch_laser", "traces": count, "seconds": elapsed,
+                    "per_second": count / elapsed})
+    return results
+
+def bench_search(name, board, depth, stats=False):
+    """
+    stats: also report the search counters (see search_stats.SearchStats). They slow the search down
+    """
+    tree = GameTree(stats=SearchStats() if stats else None)
+    start = time.perf_counter()
+    result = tree.search(board, depth)
+    elapsed = time.perf_counter() - start
+    report = {"position": name, "benchmark": "search", "depth": result.depth, "nodes": result.nodes,
+              "score": result.score, "seconds": elapsed, "nodes_per_second": result.nodes / elapsed}
+    if stats:
+        report["stats"] = result.stats
+    return report
+
+def run_benchmarks(positions=None, perft_depth=2, search_depth=4, min_seconds=0.5, batch_size=1024, stats=False):
+    """
+    Run every benchmark on the named positions (all of get_benchmark_positions by default).
+    Returns a list of result dicts, one per measurement
+    """
+    boards = get_benchmark_positions()
+    results = []
+    for name in positions or boards:
+        board = boards[name]
+        results.extend(bench_perft(name, board, perft_depth))
+        results.append(bench_make_move(name, board, min_seconds))
+        results.extend(bench_laser(name, board, min_seconds, batch_size))
+        if search_depth:
+            results.append(bench_search(name, board, search_depth, stats))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft and throughput benchmarks for move generation and search")
+    parser.add_argument("--positions", nargs="*", help="positions to run, all by default")
+    parser.add_argument("--perft-depth", type=int, default=2)
+    parser.add_argument("--search-depth", type=int, default=4, help="0 skips the search benchmark")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="minimum duration of each throughput benchmark")
+    parser.add_argument("--batch-size", type=int, default=1024, help="boards per batched laser call")
+    parser.add_argument("--stats", action="store_true", help="include search counters in the search benchmark")
+    parser.add_argument("--output", help="write the results as JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.positions, args.perft_depth, args.search_depth, args.min_seconds, args.batch_size,
+                             args.stats)
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    failed = [result for result in results if result.get("ok") is False]
+    for result in failed:
+        print(f"Perft mismatch for {result['position']} at depth {result['depth']}: "
+              f"{result['nodes']} != {result['expected']}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,172 @@
 import numpy as np
 import math
 import itertools
-import copy
 import enum
-from typing import Tuple
-
-from pieces import PieceColor, PieceType, Rotation, get_piece_from_piece_type, turn_180
+import random
+from typing import Iterator, List, Optional, Tuple
+
+from batch_laser import N_SQUARES, RED_LASER_SQUARE, SILVER_LASER_SQUARE, apply_moves
+from evaluation import MATERIAL_BY_CODE
+from pieces import (ELIMINATED, NO_DIRECTION, PACKED_MOVE_GENERATORS, PIECE_SHIFT, REFLECTION_TABLE, ROTATION_MASK,
+                    ROTATION_SHIFT, SCARAB_CODE, SILVER_BIT, SQUARE_MASK, SWAP_FLAG, TO_SHIFT, PieceColor, PieceType, Rotation,
+                    Move, move_to_packed, turn_180, unpack_move)
+
+# Square codes are defined in pieces.py:
+#   bits 4-6: PieceType value, bit 3: set for SILVER, bits 0-2: Rotation value
+
+# code -> (PieceType, PieceColor, Rotation), so decoding a square never builds enums
+DECODE = [None] * 128
+for _piece in PieceType:
+    if _piece == PieceType.NONE:
+        continue
+    for _color in PieceColor:
+        for _rotation in Rotation:
+            _code = (_piece.value << PIECE_SHIFT) | (SILVER_BIT if _color == PieceColor.SILVER else 0) | _rotation.value
+            DECODE[_code] = (_piece, _color, _rotation)
+
+# Zobrist keys: ZOBRIST_KEYS[code][idx] for a square code (piece, color, rotation) on square idx,
+# XORed together with ZOBRIST_SILVER_TO_MOVE when silver is to move. The generator is seeded so hashes
+# are the same in every process. ZOBRIST_KEYS[0] (empty) is all zeros.
+_zobrist_random = random.Random(0x1A5E2C4E55)
+ZOBRIST_KEYS = [[0] * N_SQUARES if DECODE[_code] is None else [_zobrist_random.getrandbits(64) for _ in range(N_SQUARES)]
+                for _code in range(128)]
+ZOBRIST_SILVER_TO_MOVE = _zobrist_random.getrandbits(64)
+# ZOBRIST_KEYS as a (128, N_SQUARES) array, to hash stacks of boards at once
+ZOBRIST_KEYS_ARRAY = np.array(ZOBRIST_KEYS, dtype=np.uint64)
+
+# 180 degree rotation with the colors swapped, the symmetry of the classic setup (see from_config_list).
+# MIRROR_CODE[code] is the square code a piece turns into: other color, rotation turned 180 degrees except for
+# scarabs, which only use NE and NW and reflect the same both ways. Square idx maps to N_SQUARES - 1 - idx
+MIRROR_CODE = [0] * 128
+for _code in range(1, 128):
+    if DECODE[_code] is not None:
+        _piece, _color, _rotation = DECODE[_code]
+        MIRROR_CODE[_code] = ((_code ^ SILVER_BIT) if _piece == PieceType.SCARAB
+                              else ((_code ^ SILVER_BIT) & ~ROTATION_MASK) | turn_180(_rotation).value)
+# MIRROR_ZOBRIST_KEYS[code][idx] is the key of the mirrored piece on the mirrored square, so XORing them gives
+# the hash of the mirrored position (with the side to move swapped too)
+MIRROR_ZOBRIST_KEYS = [[ZOBRIST_KEYS[MIRROR_CODE[_code]][N_SQUARES - 1 - _idx] for _idx in range(N_SQUARES)]
+                       for _code in range(128)]
+MIRROR_ZOBRIST_KEYS_ARRAY = np.array(MIRROR_ZOBRIST_KEYS, dtype=np.uint64)
+
+# Per-direction, per-square rays: RAY_SQUARES[direction][idx] lists the squares a laser leaving
+# idx in direction passes over, in order, and RAY_MASKS holds the same squares as a bitboard.
+# Directions are indexed by Rotation value; only N, E, S and W have rays.
+RAY_SQUARES = [None] * 8
+RAY_MASKS = [None] * 8
+for _direction, (_dr, _dc) in ((Rotation.N, (-1, 0)), (Rotation.E, (0, 1)), (Rotation.S, (1, 0)), (Rotation.W, (0, -1))):
+    RAY_SQUARES[_direction.value] = []
+    RAY_MASKS[_direction.value] = []
+    for _idx in range(N_SQUARES):
+        _r, _c = divmod(_idx, 10)
+        _ray = []
+        _r, _c = _r + _dr, _c + _dc
+        while 0 <= _r < 8 and 0 <= _c < 10:
+            _ray.append(_r * 10 + _c)
+            _r, _c = _r + _dr, _c + _dc
+        RAY_SQUARES[_direction.value].append(tuple(_ray))
+        RAY_MASKS[_direction.value].append(sum(1 << i for i in _ray))
+# Rays going E or S walk up the square indices, so the nearest piece is the lowest set bit
+RAY_INCREASING = [False] * 8
+RAY_INCREASING[Rotation.E.value] = True
+RAY_INCREASING[Rotation.S.value] = True
 
 class Board:
     # TODO: support special squares that only one of a color can enter
     n_rows = 8
     n_cols = 10
-    def __init__(self, board_config, eliminated_pieces_red, eliminated_pieces_silver, next_turn):
-        self.board_config = board_config
+    def __init__(self, board_config, eliminated_pieces_red, eliminated_pieces_silver, next_turn,
+                 occupancy=None, hash=None, material=None, mirror_hash=None):
+        # board_config is either a flat bytearray of n_rows * n_cols square codes or anything
+        # numpy can turn into an (n_rows, n_cols) array of codes.
+        # occupancy, hash, material and mirror_hash can be passed when they are already known
+        # (see notation.decode_boards)
+        if not isinstance(board_config, bytearray):
+            board_config = bytearray(np.asarray(board_config, dtype=np.uint8).ravel())
+        assert len(board_config) == Board.n_rows * Board.n_cols
+        self.squares = board_config
         self.eliminated_pieces_red = eliminated_pieces_red
         self.eliminated_pieces_silver = eliminated_pieces_silver
         self.next_turn = next_turn
+        self.move_stack = []
+        # Bitboard of occupied squares, bit idx is set when squares[idx] is not empty
+        self.occupancy = sum(1 << idx for idx, code in enumerate(board_config) if code) if occupancy is None else occupancy
+        self.hash = self.compute_hash() if hash is None else hash
+        # Hash of mirrored(), kept up to date by make_move like hash
+        self.mirror_hash = self.compute_mirror_hash() if mirror_hash is None else mirror_hash
+        # Running material total with evaluation.piece_to_value, positive when Red is ahead
+        self.material = sum(MATERIAL_BY_CODE[code] for code in board_config) if material is None else material
+        # search_stats.SearchStats counting laser traces in make_move, set by GameTree during a search
+        self.stats = None
+
+    def compute_hash(self) -> int:
+        """
+        Zobrist hash of the position from scratch. make_move keeps self.hash up to date incrementally
+        """
+        h = ZOBRIST_SILVER_TO_MOVE if self.next_turn == PieceColor.SILVER else 0
+        for idx, code in enumerate(self.squares):
+            h ^= ZOBRIST_KEYS[code][idx]
+        return h
+
+    def compute_mirror_hash(self) -> int:
+        """
+        Zobrist hash of mirrored() from scratch
+        """
+        h = ZOBRIST_SILVER_TO_MOVE if self.next_turn == PieceColor.RED else 0
+        for idx, code in enumerate(self.squares):
+            h ^= MIRROR_ZOBRIST_KEYS[code][idx]
+        return h
+
+    @property
+    def canonical_key(self) -> int:
+        """
+        Same for a position and its mirror: the smaller of hash and mirror_hash. Scores from the point of view of
+        the side to move are equal for both, so they can share cache entries
+        """
+        return min(self.hash, self.mirror_hash)
+
+    def mirrored(self) -> "Board":
+        """
+        The position turned 180 degrees with the colors and the side to move swapped
+        """
+        squares = bytearray(N_SQUARES)
+        for idx, code in enumerate(self.squares):
+            squares[N_SQUARES - 1 - idx] = MIRROR_CODE[code]
+        next_turn = PieceColor.SILVER if self.next_turn == PieceColor.RED else PieceColor.RED
+        # Square idx goes to N_SQUARES - 1 - idx, so the occupancy bits come out reversed. The hashes swap places
+        occupancy = int(format(self.occupancy, f"0{N_SQUARES}b")[::-1], 2)
+        return Board(squares, list(self.eliminated_pieces_silver), list(self.eliminated_pieces_red), next_turn,
+                     occupancy, self.mirror_hash, -self.material, self.hash)
+
+    def canonical(self) -> Tuple["Board", bool]:
+        """
+        The one of this position and its mirror whose hash is canonical_key, and whether that is the mirror
+        """
+        if self.mirror_hash < self.hash:
+            return self.mirrored(), True
+        return self.copy(), False
+
+    def mirror_move(self, packed_move) -> int:
+        """
+        packed_move of this position as played in mirrored()
+        """
+        return mirror_packed_move(packed_move, self.squares[packed_move & SQUARE_MASK])
+
+    @property
+    def board_config(self):
+        """
+        (n_rows, n_cols) uint8 view of the square codes
+        """
+        return np.frombuffer(self.squares, dtype=np.uint8).reshape(Board.n_rows, Board.n_cols)
 
     @staticmethod
     def from_config_list(config_list, get_mirrored=False):
-        board_config = np.zeros((Board.n_rows, Board.n_cols))
+        squares = bytearray(Board.n_rows * Board.n_cols)
         for config in config_list:
             r, c, piece, color, rotation = config
-            board_config[r, c] = Board.get_encoding(piece, color, rotation)
+            squares[r * Board.n_cols + c] = Board.get_encoding(piece, color, rotation)
             
-            board_config[Board.n_rows - r - 1, Board.n_cols - c - 1] = Board.get_encoding(
+            squares[(Board.n_rows - r - 1) * Board.n_cols + Board.n_cols - c - 1] = Board.get_encoding(
                 piece,
                 PieceColor(-1 * color.value),
                 turn_180(rotation) if piece != PieceType.SCARAB else rotation)
@@ -32,8 +174,18 @@ class Board:
             if get_mirrored:
                 print(f"({Board.n_rows-r-1}, {Board.n_cols-c-1}, {piece}, {PieceColor.SILVER}, { turn_180(rotation) if piece != PieceType.SCARAB else rotation}),")
 
-        return Board(board_config, [], [], PieceColor.RED)
+        return Board(squares, [], [], PieceColor.RED)
     
+    @staticmethod
+    def from_piece_list(piece_list, next_turn=PieceColor.RED):
+        """
+        Board with exactly the given (row, col, piece, color, rotation) pieces and nothing mirrored
+        """
+        squares = bytearray(Board.n_rows * Board.n_cols)
+        for r, c, piece, color, rotation in piece_list:
+            squares[r * Board.n_cols + c] = Board.get_encoding(piece, color, rotation)
+        return Board(squares, [], [], next_turn)
+
     def _is_valid(self):
         # TODO: check correct number of pieces
         # TODO: check peices not on incorrect colored squares
@@ -52,156 +204,347 @@ class Board:
         
         return piece, color
 
-    def make_move(self, position, move) -> "Board":
+    def to_compact(self) -> Tuple[bytes, int, Tuple[int, ...], Tuple[int, ...]]:
         """
-        Make move, compute if any pieces got eliminated, generate a new board
+        Small picklable form of the position: (square codes, side to move, eliminated red and silver piece values)
         """
-        new_board = copy.deepcopy(self.board_config)
+        return (bytes(self.squares), self.next_turn.value,
+                tuple(piece.value for piece in self.eliminated_pieces_red),
+                tuple(piece.value for piece in self.eliminated_pieces_silver))
 
-        piece, color, _ = self.get_piece_properties(position)
-        assert(color == self.next_turn)
+    @staticmethod
+    def from_compact(compact) -> "Board":
+        squares, next_turn, eliminated_red, eliminated_silver = compact
+        return Board(bytearray(squares), [PieceType(piece) for piece in eliminated_red],
+                     [PieceType(piece) for piece in eliminated_silver], PieceColor(next_turn))
 
-        if move.is_position_new and not self.is_empty(move.position):
-            if piece != PieceType.SCARAB:
-                raise ValueError(f"Cannot swap type {piece} with another piece")
-            new_board[position] = Board.get_encoding(*self.get_piece_properties(move.position))
-        else:
-            new_board[position] = 0
-        new_board[move.position] = Board.get_encoding(piece, color, move.rotation)
+    def copy(self) -> "Board":
+        """
+        Independent copy of the position. The undo stack is not carried over
+        """
+        return Board(bytearray(self.squares), list(self.eliminated_pieces_red), list(self.eliminated_pieces_silver),
+                     self.next_turn, self.occupancy, self.hash, self.material, self.mirror_hash)
 
-        new_board_obj = Board(new_board, self.eliminated_pieces_red, self.eliminated_pieces_silver, PieceColor(-1 * self.next_turn.value))
+    def make_move(self, position, move) -> Tuple[Optional[PieceType], Optional[PieceColor]]:
+        """
+        Make move in place, fire the laser of the player who moved and push an undo record.
+        Returns the piece and color that got eliminated, (None, None) if nothing was hit
+        """
+        eliminated_code = self.make_packed_move(move_to_packed(position, move))
+        if not eliminated_code:
+            return None, None
+        piece, color, _ = DECODE[eliminated_code]
+        return piece, color
 
-        if self.next_turn == PieceColor.RED:
-            laser_position = (0, 0)
+    def make_packed_move(self, packed_move) -> int:
+        """
+        make_move for a packed move (see pieces.pack_move).
+        Returns the square code of the eliminated piece, 0 if nothing was hit
+        """
+        squares = self.squares
+        from_idx = packed_move & SQUARE_MASK
+        to_idx = (packed_move >> TO_SHIFT) & SQUARE_MASK
+
+        from_code = squares[from_idx]
+        to_code = squares[to_idx]
+        color = self.next_turn
+        assert(from_code and bool(from_code & SILVER_BIT) == (color == PieceColor.SILVER))
+
+        new_code = (from_code & ~ROTATION_MASK) | ((packed_move >> ROTATION_SHIFT) & ROTATION_MASK)
+        old_hash = self.hash
+        old_mirror_hash = self.mirror_hash
+        h = old_hash ^ ZOBRIST_SILVER_TO_MOVE ^ ZOBRIST_KEYS[from_code][from_idx]
+        mh = old_mirror_hash ^ ZOBRIST_SILVER_TO_MOVE ^ MIRROR_ZOBRIST_KEYS[from_code][from_idx]
+        if from_idx != to_idx and to_code:
+            if from_code & ~(SILVER_BIT | ROTATION_MASK) != SCARAB_CODE:
+                raise ValueError(f"Cannot swap type {DECODE[from_code][0]} with another piece")
+            squares[from_idx] = to_code
+            h ^= ZOBRIST_KEYS[to_code][from_idx] ^ ZOBRIST_KEYS[to_code][to_idx]
+            mh ^= MIRROR_ZOBRIST_KEYS[to_code][from_idx] ^ MIRROR_ZOBRIST_KEYS[to_code][to_idx]
         else:
-            laser_position = (7, 9)
-        
-        laser_direction = new_board_obj.get_rotation(laser_position)
-        eliminated_piece, eliminated_color = (None, None)
-        while True:
-            next_hit = new_board_obj.get_next_hit(laser_position, laser_direction)
-            if next_hit is None:
-                break
-            piece, piece_color, piece_rotation = new_board_obj.get_piece_properties(next_hit)
-            got_hit, new_laser_direction = get_piece_from_piece_type(piece).hit(laser_direction, piece_rotation)
-
-            if got_hit:
-                eliminated_piece, eliminated_color = new_board_obj.eliminate_piece(next_hit)
-                break
+            squares[from_idx] = 0
+            if from_idx != to_idx:
+                self.occupancy ^= (1 << from_idx) | (1 << to_idx)
+        squares[to_idx] = new_code
+        h ^= ZOBRIST_KEYS[new_code][to_idx]
+        mh ^= MIRROR_ZOBRIST_KEYS[new_code][to_idx]
+
+        eliminated_idx = self._fire_laser(color, self.stats)
+        eliminated_code = 0
+        if eliminated_idx is not None:
+            eliminated_code = squares[eliminated_idx]
+            if eliminated_code & SILVER_BIT:
+                self.eliminated_pieces_silver.append(DECODE[eliminated_code][0])
+            else:
+                self.eliminated_pieces_red.append(DECODE[eliminated_code][0])
+            squares[eliminated_idx] = 0
+            self.occupancy ^= 1 << eliminated_idx
+            h ^= ZOBRIST_KEYS[eliminated_code][eliminated_idx]
+            mh ^= MIRROR_ZOBRIST_KEYS[eliminated_code][eliminated_idx]
+            self.material -= MATERIAL_BY_CODE[eliminated_code]
+        self.hash = h
+        self.mirror_hash = mh
+
+        # (moved square, destination square, moved code, swapped code, eliminated square, eliminated code,
+        #  side to move, hash and mirror hash before the move)
+        self.move_stack.append((from_idx, to_idx, from_code, to_code, eliminated_idx, eliminated_code, color, old_hash,
+                                old_mirror_hash))
+        self.next_turn = PieceColor.SILVER if color == PieceColor.RED else PieceColor.RED
+
+        return eliminated_code
+
+    def generate_moves(self) -> List[int]:
+        """
+        All packed moves for the side to move
+        """
+        squares = self.squares
+        silver = SILVER_BIT if self.next_turn == PieceColor.SILVER else 0
+        moves = []
+        for idx, code in enumerate(squares):
+            if code and (code & SILVER_BIT) == silver:
+                moves.extend(PACKED_MOVE_GENERATORS[code >> PIECE_SHIFT](squares, idx))
+        return moves
+
+    def iter_packed_moves(self) -> Iterator[int]:
+        """
+        Lazily yield packed moves for the side to move, one piece at a time.
+        The board may be changed with make/unmake between items as long as it is restored
+        """
+        squares = self.squares
+        silver = SILVER_BIT if self.next_turn == PieceColor.SILVER else 0
+        for idx in range(N_SQUARES):
+            code = squares[idx]
+            if code and (code & SILVER_BIT) == silver:
+                yield from PACKED_MOVE_GENERATORS[code >> PIECE_SHIFT](squares, idx)
+
+    def iter_moves(self) -> Iterator[Tuple[Tuple[int, int], Move]]:
+        """
+        Lazily yield (position, Move) pairs for the side to move without building any boards.
+        Apply one with make_move (and unmake_move) or get_board_after_move when it is needed
+        """
+        for packed_move in self.iter_packed_moves():
+            yield unpack_move(packed_move)
 
-            if new_laser_direction is None:
-                # Laser is blocked
-                break
+    def unmake_move(self):
+        """
+        Undo the last move made with make_move
+        """
+        (from_idx, to_idx, from_code, to_code, eliminated_idx, eliminated_code, next_turn, self.hash,
+         self.mirror_hash) = self.move_stack.pop()
+        squares = self.squares
+        if eliminated_idx is not None:
+            squares[eliminated_idx] = eliminated_code
+            self.occupancy ^= 1 << eliminated_idx
+            self.material += MATERIAL_BY_CODE[eliminated_code]
+            if eliminated_code & SILVER_BIT:
+                self.eliminated_pieces_silver.pop()
+            else:
+                self.eliminated_pieces_red.pop()
+        if from_idx != to_idx and not to_code:
+            self.occupancy ^= (1 << from_idx) | (1 << to_idx)
+        squares[to_idx] = to_code
+        squares[from_idx] = from_code
+        self.next_turn = next_turn
 
-            laser_direction = new_laser_direction
-            laser_position = next_hit
+    def peek_laser(self, packed_move) -> int:
+        """
+        Square code of the piece the side to move's laser would eliminate after packed_move, 0 if none.
+        Only the squares and occupancy are touched, and they are restored before returning
+        """
+        squares = self.squares
+        from_idx = packed_move & SQUARE_MASK
+        to_idx = (packed_move >> TO_SHIFT) & SQUARE_MASK
+        from_code = squares[from_idx]
+        to_code = squares[to_idx]
+        occupancy = self.occupancy
+        if from_idx != to_idx:
+            squares[from_idx] = to_code
+            if not to_code:
+                self.occupancy = occupancy ^ ((1 << from_idx) | (1 << to_idx))
+        squares[to_idx] = (from_code & ~ROTATION_MASK) | ((packed_move >> ROTATION_SHIFT) & ROTATION_MASK)
+        eliminated_idx = self._fire_laser(self.next_turn)
+        eliminated_code = squares[eliminated_idx] if eliminated_idx is not None else 0
+        squares[to_idx] = to_code
+        squares[from_idx] = from_code
+        self.occupancy = occupancy
+        return eliminated_code
+
+    def get_board_after_move(self, position, move) -> "Board":
+        """
+        Generate a new board with the move applied, leaving this one untouched
+        """
+        new_board = self.copy()
+        new_board.make_move(position, move)
+        new_board.move_stack.clear()
+        return new_board
 
-        return new_board_obj #, eliminated_piece, eliminated_color
+    def _fire_laser(self, color, stats=None):
+        """
+        Trace the laser of color and return the square index of the piece it eliminates, or None.
+        stats (a SearchStats) counts the trace and its straight segments
+        """
+        squares = self.squares
+        occupancy = self.occupancy
+        idx = RED_LASER_SQUARE if color == PieceColor.RED else SILVER_LASER_SQUARE
+        direction = squares[idx] & ROTATION_MASK
+        if stats is not None:
+            stats.laser_traces += 1
+        while True:
+            if stats is not None:
+                stats.laser_steps += 1
+            hits = RAY_MASKS[direction][idx] & occupancy
+            if not hits:
+                return None
+            if RAY_INCREASING[direction]:
+                idx = (hits & -hits).bit_length() - 1
+            else:
+                idx = hits.bit_length() - 1
 
+            code = squares[idx]
+            outcome = REFLECTION_TABLE[code >> PIECE_SHIFT][code & ROTATION_MASK][direction]
+            if outcome is None:
+                raise ValueError(f"Invalid laser direction {Rotation(direction)} for piece {DECODE[code]}")
+            eliminated, direction = outcome
 
-    def get_next_hit(self, laser_position, laser_direction):
-        def _get_next_nonzero_idx(row_or_col, curr_idx, greater_than=True):
-            nonzero_idxs = np.nonzero(row_or_col)[0]
-            if greater_than:
-                nonzero_idxs = nonzero_idxs[nonzero_idxs > curr_idx]
-                if len(nonzero_idxs) == 0:
-                    return None
-                return np.min(nonzero_idxs)
-            else:
-                nonzero_idxs = nonzero_idxs[nonzero_idxs < curr_idx]
-                if len(nonzero_idxs) == 0:
-                    return None
-                return np.max(nonzero_idxs)
-            
+            if eliminated == ELIMINATED:
+                return idx
 
-        if laser_direction == Rotation.N or laser_direction == Rotation.S:
-            col = self.board_config[:, laser_position[1]]
-            idx = _get_next_nonzero_idx(col, laser_position[0], greater_than=laser_direction == Rotation.S)
-            if idx is None:
-                return None
-            return (idx, laser_position[1])
-        elif laser_direction == Rotation.E or laser_direction == Rotation.W:
-            row = self.board_config[laser_position[0], :]
-            idx = _get_next_nonzero_idx(row, laser_position[1], greater_than=laser_direction == Rotation.E)
-            if idx is None:
+            if direction == NO_DIRECTION:
+                # Laser is blocked
                 return None
-            return (laser_position[0], idx)
+
+    def _get_next_hit_idx(self, idx, direction):
+        """
+        Square index of the first piece a laser leaving idx in direction (a Rotation value) hits, or None
+        """
+        ray = RAY_MASKS[direction]
+        if ray is None:
+            return None
+        hits = ray[idx] & self.occupancy
+        if not hits:
+            return None
+        if RAY_INCREASING[direction]:
+            return (hits & -hits).bit_length() - 1
+        return hits.bit_length() - 1
+
+    def get_next_hit(self, laser_position, laser_direction):
+        idx = self._get_next_hit_idx(laser_position[0] * Board.n_cols + laser_position[1], laser_direction.value)
+        if idx is None:
+            return None
+        return divmod(idx, Board.n_cols)
 
     @staticmethod
     def get_encoding(piece, color, rotation):
-        return color.value * (piece.value + (rotation.value/8.0))
+        return (piece.value << PIECE_SHIFT) | (SILVER_BIT if color == PieceColor.SILVER else 0) | rotation.value
 
 
     def in_bounds(self, position) -> bool:
-        return position[0] >= 0 and position[0] <= 8 and \
-            position[1] >= 0 and position[1] <= 10
+        return position[0] >= 0 and position[0] < Board.n_rows and \
+            position[1] >= 0 and position[1] < Board.n_cols
 
     def get_piece(self, position: Tuple[int, int]):
         """
         Given a (r, c) return piece type
         """
         assert(self.in_bounds(position))
-        val = self.board_config[position]
-        piece = int(np.floor(abs(val)))
-        return PieceType(piece)
+        return PieceType(self.squares[position[0] * Board.n_cols + position[1]] >> PIECE_SHIFT)
     
     def get_color(self, position):
         assert(self.in_bounds(position))
-        val = self.board_config[position]
-        color = PieceColor.SILVER if val > 0 else PieceColor.RED
+        val = self.squares[position[0] * Board.n_cols + position[1]]
+        color = PieceColor.SILVER if val & SILVER_BIT else PieceColor.RED
         return color
 
     def get_rotation(self, position: Tuple[int, int]):
         assert(self.in_bounds(position))
-        val = abs(self.board_config[position])
         # TODO do some validation to make sure rotation is valid
-        return Rotation( int( 8 * (val % 1)))
+        return DECODE[self.squares[position[0] * Board.n_cols + position[1]]][2]
     
     def get_piece_properties(self, position):
         assert(self.in_bounds(position))
-        val = self.board_config[position]
-        piece = PieceType(int(np.floor(abs(val))))
-        color = PieceColor.SILVER if val > 0 else PieceColor.RED
-
-        val = abs(val)
-        rotation = Rotation( int( 8 * (val % 1)))
-
-        return piece, color, rotation
+        return DECODE[self.squares[position[0] * Board.n_cols + position[1]]]
 
     def is_empty(self, position):
-        val = self.board_config[position]
-        return val == 0
+        return self.squares[position[0] * Board.n_cols + position[1]] == 0
 
-    def get_next_moves(self):
-        new_boards = []
+    def get_next_moves(self, as_array=False):
+        """
+        Every child board. Prefer iter_moves when not every child is needed.
+        With as_array, returns ([(position, Move)], stack) instead, where stack is the
+        (N, n_rows, n_cols) uint8 array of child square codes from get_child_stack
+        """
+        if as_array:
+            moves, stack = self.get_child_stack()
+            return [unpack_move(packed_move) for packed_move in moves], stack
         # TODO: don't move Pharoah/Anubis in early game since it doesn't really help
+        return [self.get_board_after_move(position, move) for position, move in self.iter_moves()]
 
-        piece_positions = self.get_piece_positions(filter_by_color=True)
-        for position in piece_positions:
-            piece_type, color, _ = self.get_piece_properties(position)
-
-            moves = get_piece_from_piece_type(piece_type).get_moves(self, position)
-
-            new_boards.extend([self.make_move(position, move) for move in moves])
-
-        return new_boards
+    def get_child_stack(self, moves=None) -> Tuple[List[int], np.ndarray]:
+        """
+        Square codes of every child, stacked into an (N, n_rows, n_cols) uint8 array, without building any boards.
+        The moves are applied and the lasers fired for all children at once with batch_laser.apply_moves.
+        Returns the packed moves (all moves of the side to move if not given) and the stack, in the same order
+        """
+        if moves is None:
+            moves = self.generate_moves()
+        if not moves:
+            return moves, np.zeros((0, Board.n_rows, Board.n_cols), dtype=np.uint8)
+        stack, _ = apply_moves(self.squares, moves, self.next_turn)
+        return moves, stack
 
     def get_piece_positions(self, filter_by_color=False):
-        B = self.board_config
         if filter_by_color:
-            B = B < 0 if self.next_turn == PieceColor.RED else B > 0
-        pieces_idxs = np.nonzero(B)
-
-        positions = []
-
-        for i in range(np.shape(pieces_idxs)[1]):
-            positions.append((pieces_idxs[0][i], pieces_idxs[1][i]))
-        
-        return positions
-
-        
-            
-
-
-
-
+            silver = SILVER_BIT if self.next_turn == PieceColor.SILVER else 0
+            return [divmod(idx, Board.n_cols) for idx, code in enumerate(self.squares)
+                    if code and (code & SILVER_BIT) == silver]
+        return [divmod(idx, Board.n_cols) for idx, code in enumerate(self.squares) if code]
+
+
+def mirror_packed_move(packed_move, code) -> int:
+    """
+    packed_move as played in the mirrored position (see Board.mirrored). code is the square code of the moving
+    piece in either position, only whether it is a scarab matters. Mirroring twice gives back packed_move
+    """
+    from_idx = packed_move & SQUARE_MASK
+    to_idx = (packed_move >> TO_SHIFT) & SQUARE_MASK
+    rotation = (packed_move >> ROTATION_SHIFT) & ROTATION_MASK
+    if code & ~(SILVER_BIT | ROTATION_MASK) != SCARAB_CODE:
+        rotation = (rotation + 4) % 8
+    return ((N_SQUARES - 1 - from_idx) | ((N_SQUARES - 1 - to_idx) << TO_SHIFT) | (rotation << ROTATION_SHIFT)
+            | (packed_move & SWAP_FLAG))
+
+def trace_laser(board, color) -> Tuple[List[Tuple[int, int]], Optional[Tuple[int, int]]]:
+    """
+    Follow the laser of color on board without changing it.
+    Returns:
+        path: every square the laser passes over in order, starting at the sphinx and ending
+            where the laser is blocked, eliminates a piece or leaves the board
+        eliminated: the square of the piece the laser would eliminate, None if nothing is hit
+    """
+    squares = board.squares
+    idx = RED_LASER_SQUARE if color == PieceColor.RED else SILVER_LASER_SQUARE
+    direction = squares[idx] & ROTATION_MASK
+    path = [idx]
+    eliminated = None
+    while True:
+        next_idx = board._get_next_hit_idx(idx, direction)
+        ray = RAY_SQUARES[direction][idx]
+        if next_idx is None:
+            path.extend(ray)
+            break
+        path.extend(ray[:ray.index(next_idx) + 1])
+        idx = next_idx
+
+        code = squares[idx]
+        outcome = REFLECTION_TABLE[code >> PIECE_SHIFT][code & ROTATION_MASK][direction]
+        if outcome is None:
+            raise ValueError(f"Invalid laser direction {Rotation(direction)} for piece {DECODE[code]}")
+        got_hit, direction = outcome
+        if got_hit == ELIMINATED:
+            eliminated = idx
+            break
+        if direction == NO_DIRECTION:
+            break
+
+    return ([divmod(i, Board.n_cols) for i in path],
+            divmod(eliminated, Board.n_cols) if eliminated is not None else None)
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from game_tree import MAX_DEPTH, GameTree
+from notation import from_notation, move_from_text, move_to_text, to_notation
+from positional_evaluation import PositionalEvaluator
+from positions import initialize_classic_board
+
+ENGINE_NAME = "LaserChessBot"
+
+# UCI-style line protocol. Moves are in notation.move_to_text form, positions in notation.to_notation form.
+#   uci                                  -> id name ..., option ..., uciok
+#   isready                              -> readyok, also while searching
+#   ucinewgame                           clear the transposition table and the kept tree
+#   setoption name Ponder value true|false
+#   position startpos|notation <rows> <side> <eliminated> [moves <move> ...]
+#   go [depth N] [movetime MS] [nodes N] [infinite]
+#                                        -> info depth .. score .. nodes .. time .. pv ... after every iteration,
+#                                           then bestmove <move> [ponder <move>], or bestmove (none)
+#   stop                                 end the running search, which still answers with its bestmove
+#   d                                    -> info string <position in text notation>
+#   quit
+# Errors are answered with "info string error: ..." and the command is ignored.
+# Without limits go searches to the GameTree's default depth, infinite searches until stop.
+# After a bestmove with a ponder move, and with Ponder on, the engine searches the position after both moves until
+# the next command, so its tables are warm if the opponent plays the expected reply.
+
+class Engine:
+    """
+    One GameTree kept warm between searches, driven by protocol lines (see above). Searches run on a worker thread,
+    so the event loop keeps reading commands and stop takes effect within BUDGET_CHECK_INTERVAL nodes.
+    output: called with every line the engine answers
+    """
+    def __init__(self, output, ponder=True, **tree_kwargs):
+        self.output = output
+        self.ponder = ponder
+        self.tree = GameTree(**tree_kwargs)
+        self.board = initialize_classic_board()
+        # The GameTree isn't thread safe, so every search runs on this one thread
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # Running go search, as an asyncio task that ends with its bestmove, the ponder search started after it,
+        # and the event that stops both
+        self._search = None
+        self._ponder_search = None
+        self._infinite = False
+        self._stop_event = threading.Event()
+
+    async def handle(self, line) -> bool:
+        """
+        Run one command line. Returns False on quit
+        """
+        command, *args = line.split() or [""]
+        if command == "quit":
+            return False
+        if command == "isready":
+            self.output("readyok")
+        elif command == "stop":
+            await self.stop()
+        elif command:
+            # Anything else waits for a go search with limits to answer, and stops pondering and infinite searches
+            if self._search is not None and not self._infinite:
+                await asyncio.shield(self._search)
+            await self.stop()
+            try:
+                self._run(command, args)
+            except ValueError as e:
+                self.output(f"info string error: {e}")
+        return True
+
+    def _run(self, command, args):
+        if command == "uci":
+            self.output(f"id name {ENGINE_NAME}")
+            self.output(f"option name Ponder type check default {'true' if self.ponder else 'false'}")
+            self.output("uciok")
+        elif command == "ucinewgame":
+            if self.tree.transposition_table is not None:
+                self.tree.transposition_table.clear()
+            self.tree.root = self.tree.root_hash = None
+        elif command == "setoption":
+            self._set_option(args)
+        elif command == "position":
+            self.board = self._parse_position(args)
+        elif command == "go":
+            self._go(*self._parse_limits(args))
+        elif command == "d":
+            self.output(f"info string {to_notation(self.board)}")
+        else:
+            raise ValueError(f"Unknown command {command!r}")
+
+    def _set_option(self, args):
+        if len(args) != 4 or args[0] != "name" or args[2] != "value":
+            raise ValueError("Expected setoption name <name> value <value>")
+        if args[1].lower() != "ponder":
+            raise ValueError(f"Unknown option {args[1]!r}")
+        if args[3].lower() not in ("true", "false"):
+            raise ValueError(f"Ponder takes true or false, not {args[3]!r}")
+        self.ponder = args[3].lower() == "true"
+
+    @staticmethod
+    def _parse_position(args):
+        if "moves" in args:
+            moves = args[args.index("moves") + 1:]
+            args = args[:args.index("moves")]
+        else:
+            moves = []
+        if args == ["startpos"]:
+            board = initialize_classic_board()
+        elif args[:1] == ["notation"]:
+            board = from_notation(" ".join(args[1:]))
+        else:
+            raise ValueError("Expected position startpos|notation <rows> <side> <eliminated> [moves ...]")
+        for text in moves:
+            move = move_from_text(text)
+            if move not in board.generate_moves():
+                raise ValueError(f"Illegal move {text} in {to_notation(board)}")
+            board.make_packed_move(move)
+        # Only the position is kept, not the moves that led to it
+        return board.copy()
+
+    @staticmethod
+    def _parse_limits(args):
+        depth = time_limit = max_nodes = None
+        infinite = False
+        args = iter(args)
+        try:
+            for name in args:
+                if name == "depth":
+                    depth = int(next(args))
+                elif name == "movetime":
+                    time_limit = int(next(args)) / 1000
+                elif name == "nodes":
+                    max_nodes = int(next(args))
+                elif name == "infinite":
+                    infinite = True
+                else:
+                    raise ValueError(f"Unknown go limit {name!r}")
+        except StopIteration:
+            raise ValueError(f"Missing value after go {name}") from None
+        if infinite and depth is None:
+            depth = MAX_DEPTH
+        return depth, time_limit, max_nodes, infinite
+
+    def _go(self, depth, time_limit, max_nodes, infinite):
+        self._stop_event.clear()
+        self._infinite = infinite
+        self._search = asyncio.ensure_future(self._search_and_reply(self.board.copy(), depth, time_limit, max_nodes))
+
+    async def _search_and_reply(self, board, depth, time_limit, max_nodes):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        def on_iteration(result):
+            # Called on the search thread
+            loop.call_soon_threadsafe(self._info, result, time.perf_counter() - start)
+
+        try:
+            try:
+                result = await loop.run_in_executor(self._executor, partial(
+                    self.tree.search, board, depth, time_limit=time_limit, max_nodes=max_nodes,
+                    stop_event=self._stop_event, on_iteration=on_iteration))
+            except Exception as e:
+                self.output(f"info string error: {e}")
+                self.output("bestmove (none)")
+                return
+            # Flush the info lines still queued behind this one
+            await asyncio.sleep(0)
+            if not result.pv:
+                self.output("bestmove (none)")
+                return
+            ponder_move = result.pv[1] if len(result.pv) > 1 else None
+            self.output(f"bestmove {move_to_text(result.pv[0])}"
+                        + (f" ponder {move_to_text(ponder_move)}" if ponder_move is not None else ""))
+            if self.ponder and ponder_move is not None and not self._stop_event.is_set():
+                self._ponder_search = loop.run_in_executor(self._executor, self._ponder, board, result.pv[0],
+                                                           ponder_move)
+        finally:
+            # Commands wait on this task until the bestmove is out, pondering goes on in _ponder_search
+            self._search = None
+
+    def _ponder(self, board, move, ponder_move):
+        """
+        Search the position after move and the expected reply until the stop event is set. Runs on the search thread
+        """
+        self.tree.advance_root(board, move)
+        board.make_packed_move(move)
+        self.tree.advance_root(board, ponder_move)
+        board.make_packed_move(ponder_move)
+        self.tree.search(board, MAX_DEPTH, stop_event=self._stop_event)
+
+    def _info(self, result, seconds):
+        self.output(f"info depth {result.depth} score {result.score} nodes {result.nodes} time {int(seconds * 1000)} "
+                    f"nps {int(result.nodes / seconds) if seconds else 0} pv {' '.join(map(move_to_text, result.pv))}")
+
+    async def stop(self):
+        """
+        Stop the running search and pondering, and wait until the search has answered
+        """
+        if self._search is None and self._ponder_search is None:
+            return
+        self._stop_event.set()
+        if self._search is not None:
+            await asyncio.shield(self._search)
+        if self._ponder_search is not None:
+            ponder_search, self._ponder_search = self._ponder_search, None
+            try:
+                await ponder_search
+            except Exception as e:
+                self.output(f"info string error: {e}")
+
+    async def close(self):
+        await self.stop()
+        self._executor.shutdown()
+
+async def serve_stdio(engine):
+    """
+    Read commands from stdin until quit or end of input. Lines are read on a thread of their own, which works
+    for terminals, pipes and redirected files alike
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        while True:
+            line = await loop.run_in_executor(reader, sys.stdin.readline)
+            if not line or not await engine.handle(line):
+                break
+    await engine.close()
+
+async def serve_tcp(engine, host, port):
+    """
+    Accept connections on host:port, one client at a time, all sharing the warm engine. quit or closing the
+    connection ends the client's session, not the server
+    """
+    lock = asyncio.Lock()
+
+    async def client(reader, writer):
+        async with lock:
+            engine.output = lambda line: writer.write(f"{line}\n".encode())
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line or not await engine.handle(line.decode()):
+                        break
+                    await writer.drain()
+                await engine.stop()
+            finally:
+                engine.output = _print_line
+                writer.close()
+
+    server = await asyncio.start_server(client, host, port)
+    print(f"info string listening on {', '.join(str(sock.getsockname()) for sock in server.sockets)}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def _print_line(line):
+    print(line, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine service speaking a UCI-style protocol on stdio or TCP")
+    parser.add_argument("--port", type=int, help="listen on this TCP port instead of stdin/stdout")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--depth", type=int, default=5, help="search depth of go without limits")
+    parser.add_argument("--no-ponder", action="store_true", help="don't search during the opponent's turn")
+    parser.add_argument("--weights", help="positional evaluation weights (see tune.py), material only by default")
+    args = parser.parse_args(argv)
+
+    evaluator = PositionalEvaluator.load(args.weights) if args.weights else None
+    engine = Engine(_print_line, ponder=not args.no_ponder, depth=args.depth, evaluator=evaluator)
+    if args.port is None:
+        asyncio.run(serve_stdio(engine))
+    else:
+        asyncio.run(serve_tcp(engine, args.host, args.port))
+
+if __name__ == "__main__":
+    main()
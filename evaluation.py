@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from pieces import PIECE_SHIFT, SILVER_BIT, PieceColor, PieceType
+
+piece_to_value = {
+    PieceType.PYRAMID: 1,
+    PieceType.PHAROAH: 1000,
+    PieceType.SCARAB: 3,
+    PieceType.ANUBIS: 2,
+    PieceType.SPHINX: 0,
+}
+
+def get_material_by_code(values):
+    """
+    Signed material of every square code: positive for Red pieces, negative for Silver, 0 for empty
+    """
+    material = [0] * 128
+    for code in range(1, 128):
+        piece_value = code >> PIECE_SHIFT
+        if 1 <= piece_value <= 5:
+            value = values[PieceType(piece_value)]
+            material[code] = -value if code & SILVER_BIT else value
+    return material
+
+# Material of every square code with the default piece_to_value. Board keeps its running total with this
+MATERIAL_BY_CODE = get_material_by_code(piece_to_value)
+MATERIAL_BY_CODE_ARRAY = np.array(MATERIAL_BY_CODE, dtype=np.int64)
+
+def score_boards(stack, material_by_code=MATERIAL_BY_CODE_ARRAY) -> np.ndarray:
+    """
+    Material of every board in a (N, 8, 10) stack of square codes (see Board.get_child_stack), positive when Red is ahead
+    """
+    stack = np.asarray(stack)
+    return material_by_code[stack].reshape(len(stack), -1).sum(axis=1)
+
+class Evaluator(ABC):
+    """
+    Scores positions. Higher score is better for Red, lower score is better for Silver.
+    Subclasses implement evaluate, and can override update if a child's score can be derived from its parent's
+    """
+    @abstractmethod
+    def evaluate(self, board) -> int:
+        ...
+
+    def update(self, board, parent_score, eliminated_code) -> int:
+        """
+        Score of board right after a move from a position scored parent_score.
+        eliminated_code is the square code of the piece the laser eliminated, 0 if nothing was hit
+        """
+        return self.evaluate(board)
+
+    def evaluate_batch(self, stack) -> np.ndarray:
+        """
+        Scores of a (N, 8, 10) stack of square codes. Positions are only known by their squares here, so the
+        default builds a Board per row and calls evaluate. Subclasses should vectorize this
+        """
+        from board import Board
+        return np.array([self.evaluate(Board(squares, [], [], PieceColor.RED)) for squares in np.asarray(stack)],
+                        dtype=np.int64)
+
+class MaterialEvaluator(Evaluator):
+    """
+    Sum of the values of the pieces on the board
+    """
+    def __init__(self, values=None):
+        self.values = piece_to_value if values is None else values
+        self.material_by_code = MATERIAL_BY_CODE if values is None else get_material_by_code(values)
+        self.material_by_code_array = np.array(self.material_by_code, dtype=np.int64)
+
+    def evaluate(self, board) -> int:
+        if self.material_by_code is MATERIAL_BY_CODE:
+            return board.material
+        material_by_code = self.material_by_code
+        return sum(material_by_code[code] for code in board.squares)
+
+    def update(self, board, parent_score, eliminated_code) -> int:
+        # Only a capture changes the material
+        return parent_score - self.material_by_code[eliminated_code]
+
+    def evaluate_batch(self, stack) -> np.ndarray:
+        return score_boards(stack, self.material_by_code_array)
@@ -1,75 +1,586 @@
+from dataclasses import dataclass, field
+import math
+import time
+import numpy as np
+from typing import List, Optional, Tuple
+from board import N_SQUARES, mirror_packed_move
+from evaluation import MATERIAL_BY_CODE, Evaluator, MaterialEvaluator, piece_to_value
+from pieces import PHAROAH_CODE, ROTATION_MASK, SILVER_BIT, SQUARE_MASK, TO_SHIFT, Move, PieceColor, move_to_packed, unpack_move
+from search_stats import SearchStats
+from threats import analyze_threats, laser_path_mask, touches
+from transposition_table import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
 
+# Score for eliminating the opponent's Pharoah, reduced by the ply it happens at so faster wins score higher
+WIN_SCORE = 100000
+INFINITY = 10 * WIN_SCORE
+# Scores beyond this are wins or losses found in the search, their ply is stored relative to the node in the table
+WIN_THRESHOLD = WIN_SCORE - 1000
+# Depth limit of a search bounded only by time or nodes
+MAX_DEPTH = 64
+# Nodes searched between two checks of the time and node budget
+BUDGET_CHECK_INTERVAL = 1024
+# Ordering bonus of moves that start or end on the mover's laser path, ahead of killers and any history score
+LASER_PATH_BONUS = 1 << 40
+KILLER_BONUS = 1 << 39
+ORDERING_MIN_DEPTH = 2
+# Remaining depth from which nodes get a threat analysis. Right above the horizon the children are searched anyway,
+# and finding a win there costs about as much as the analysis
+THREAT_MIN_DEPTH = 2
 
-from dataclasses import dataclass
-from typing import List, Optional
-from board import Board
-from pieces import PieceColor, PieceType, get_piece_from_piece_type
+class SearchAborted(Exception):
+    """
+    Raised inside the search when its time or node budget runs out
+    """
 
-piece_to_value = {
-    PieceType.PYRAMID: 1,
-    PieceType.PHAROAH: 1000,
-    PieceType.SCARAB: 3,
-    PieceType.ANUBIS: 2,
-    PieceType.SPHINX: 0,
-}
+@dataclass(slots=True)
+class GameNode:
+    # Packed move (see pieces.pack_move) that leads to this node from its parent, None for the root
+    move: Optional[int]
+    # Last search score from the point of view of the player making move. Only a bound if the move was cut off
+    score: int = 0
+    # Searched children, best first. Only kept for nodes less than GameTree.tree_depth plies below the root
+    children: Optional[List["GameNode"]] = None
 
 @dataclass
-class GameNode:
-    board: Board
-    turn: PieceColor
-    parent: "GameNode"
-    children: Optional[List["GameNode"]]
+class SearchResult:
+    # Score from the point of view of the side to move at the root
     score: int
+    # Depth of the last completed iteration
     depth: int
+    # Principal variation as packed moves, starting with the best move
+    pv: List[int] = field(default_factory=list)
+    nodes: int = 0
+    # True if the time or node budget ran out before the requested depth was reached
+    stopped: bool = False
+    # SearchStats.report() of the search when the tree collects stats
+    stats: Optional[dict] = None
+
+    @property
+    def best_move(self) -> Optional[Tuple[Tuple[int, int], Move]]:
+        """
+        (position, Move) to play, None if there are no legal moves
+        """
+        if not self.pv:
+            return None
+        return unpack_move(self.pv[0])
 
 class GameTree:
-    def __init__(self):
-        pass
+    def __init__(self, depth=5, beam_width=None, tt_memory_mb=64, evaluator: Optional[Evaluator] = None, tree_depth=3,
+                 stats: Optional[SearchStats] = None, symmetric_tt=True, book=None, threat_analysis=False,
+                 move_ordering=True, quiescence_depth=0):
+        """
+        depth: default search depth in plies
+        beam_width: if set, only the beam_width children with the best static score are searched at every node
+        tt_memory_mb: memory cap of the transposition table, kept between searches. None or 0 disables it
+        evaluator: static evaluation, material with piece_to_value by default
+        tree_depth: plies of searched nodes kept in the tree for move ordering, and for the next search after advance_root
+        stats: if set, counters and phase timings are collected during every search and reported in SearchResult.stats
+        symmetric_tt: key the transposition table by Board.canonical_key, so a position and its mirror (turned 180
+            degrees, colors swapped) share an entry
+        book: an opening_book.OpeningBook. Positions found in it are answered from the book without searching
+        threat_analysis: look for a win in one (see threats.analyze_threats) before expanding a node, and when the
+            opponent threatens one search the moves that may block it first
+        move_ordering: after the transposition table and principal variation moves, search moves that start or end
+            on the mover's laser path first, then the killer moves of the ply, then the rest by history score
+        quiescence_depth: at the horizon keep searching up to this many plies of moves that eliminate an opponent
+            piece, so leaves aren't scored in the middle of an exchange. 0 scores the horizon statically
+        """
+        self.depth = depth
+        self.beam_width = beam_width
+        self.tree_depth = tree_depth
+        # Tree kept from the last search and the hash of the position it belongs to
+        self.root = None
+        self.root_hash = None
+        self.evaluator = MaterialEvaluator() if evaluator is None else evaluator
+        # Static scores (Red's point of view) of the positions along the current search line
+        self._scores = []
+        self.transposition_table = TranspositionTable(tt_memory_mb) if tt_memory_mb else None
+        self.symmetric_tt = symmetric_tt
+        self.book = book
+        self.threat_analysis = threat_analysis
+        self.move_ordering = move_ordering
+        self.quiescence_depth = quiescence_depth
+        # Killer moves: the last two moves that caused a beta cutoff at each ply, and history: packed move -> sum of
+        # depth squared of its cutoffs. Both are reset by every search
+        self._killers = []
+        self._history = {}
+        self.nodes = 0
+        self._prev_pv = []
+        # Search budget, checked every BUDGET_CHECK_INTERVAL nodes
+        self._deadline = None
+        self._max_nodes = None
+        self._next_budget_check = math.inf
+        self._stop_event = None
+        self.stats = stats
 
     def score_board(self, board):
-        # Lower score is better for Red, higher score is better for Silver
-        num_points = 0
-        for position in board.get_piece_positions():
-            piece_type, color, _ = board.get_piece_properties(position)
-            if color == PieceColor.RED:
-                num_points += piece_to_value[piece_type]
+        # Higher score is better for Red, lower score is better for Silver
+        return self.evaluator.evaluate(board)
+
+    def evaluate(self, board):
+        """
+        Static score from the point of view of the side to move. During a search this is the
+        incrementally updated score of the current position
+        """
+        score = self._scores[-1] if self._scores else self.score_board(board)
+        return score if board.next_turn == PieceColor.RED else -score
+
+    def _make_move(self, board, move):
+        stats = self.stats
+        if stats is None:
+            eliminated_code = board.make_packed_move(move)
+            self._scores.append(self.evaluator.update(board, self._scores[-1], eliminated_code))
+            return eliminated_code
+
+        start = time.perf_counter()
+        eliminated_code = board.make_packed_move(move)
+        made = time.perf_counter()
+        self._scores.append(self.evaluator.update(board, self._scores[-1], eliminated_code))
+        stats.phase_times["make_move"] += made - start
+        stats.phase_times["evaluation"] += time.perf_counter() - made
+        return eliminated_code
+
+    def _unmake_move(self, board):
+        if self.stats is None:
+            board.unmake_move()
+        else:
+            start = time.perf_counter()
+            board.unmake_move()
+            self.stats.phase_times["unmake_move"] += time.perf_counter() - start
+        self._scores.pop()
+
+    def search(self, board, depth=None, root_moves=None, alpha=-INFINITY, beta=INFINITY,
+               time_limit=None, max_nodes=None, stop_event=None, on_iteration=None) -> SearchResult:
+        """
+        Iterative deepening alpha-beta search from board up to depth plies.
+        root_moves restricts the search to those packed moves at the root, and alpha/beta set the root window.
+        A score outside the window is only a bound and comes with an empty principal variation.
+        time_limit (seconds) and max_nodes bound the search. When either runs out the best move found so far is
+        returned with the depth of the last completed iteration, and stopped set. Without a depth a bounded search
+        keeps deepening until its budget runs out.
+        stop_event (a threading.Event) stops the search like a spent budget once it is set, from any thread.
+        on_iteration is called with the SearchResult of every completed iteration.
+        The board is mutated with make/unmake during the search and is back in its original position when this returns.
+        A position found in the book is answered from it, with nodes 0
+        """
+        if self.book is not None and root_moves is None:
+            entry = self.book.probe(board)
+            if entry is not None:
+                move, score, book_depth = entry
+                return SearchResult(score, book_depth, [move])
+
+        bounded = time_limit is not None or max_nodes is not None
+        if depth is None:
+            depth = MAX_DEPTH if bounded else self.depth
+        self.nodes = 0
+        self._prev_pv = []
+        self._killers = [[None, None] for _ in range(depth + 1)]
+        self._history = {}
+        self._deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self._max_nodes = max_nodes
+        self._stop_event = stop_event
+        self._next_budget_check = (min(BUDGET_CHECK_INTERVAL, max_nodes or math.inf)
+                                   if bounded or stop_event is not None else math.inf)
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        stats = self.stats
+        if stats is not None:
+            stats.start()
+            board.stats = stats
+        self._scores = [self.score_board(board)]
+        if root_moves is not None:
+            root = GameNode(None, self.evaluate(board), [GameNode(move) for move in root_moves])
+        else:
+            if self.root is not None and self.root_hash == board.hash:
+                root = self.root
             else:
-                num_points -= piece_to_value[piece_type]
-        
-        return num_points
+                root = GameNode(None, self.evaluate(board))
+            self.root, self.root_hash = root, board.hash
+            moves = self._order_by_children(root, self._order_moves(board, 0), n_children=len(root.children or []))
+            children = {child.move: child for child in root.children} if root.children else {}
+            root.children = [children.get(move) or GameNode(move) for move in moves]
+        result = SearchResult(self.evaluate(board), 0)
+
+        move_stack_depth = len(board.move_stack)
+        pv = []
+        try:
+            for iteration_depth in range(1, depth + 1):
+                pv = []
+                score = self._search_root(root, board, iteration_depth, alpha, beta, pv)
+                self._prev_pv = pv
+                result = SearchResult(score, iteration_depth, pv, self.nodes)
+                if on_iteration is not None:
+                    on_iteration(result)
+                if abs(score) >= WIN_SCORE - iteration_depth:
+                    # Forced win or loss found, searching deeper can't change it
+                    break
+        except SearchAborted:
+            while len(board.move_stack) > move_stack_depth:
+                board.unmake_move()
+            if pv:
+                # The unfinished iteration searched the previous best move first, so anything it found is at least as good
+                score = next(child.score for child in root.children if child.move == pv[0])
+                result = SearchResult(score, result.depth, pv, self.nodes)
+            elif not result.pv and root.children:
+                result = SearchResult(result.score, result.depth, [root.children[0].move], self.nodes)
+            result.nodes = self.nodes
+            result.stopped = True
+        finally:
+            self._scores = []
+            self._next_budget_check = math.inf
+            self._stop_event = None
+            if stats is not None:
+                stats.stop()
+                board.stats = None
+
+        if stats is not None:
+            result.stats = stats.report()
+        return result
+
+    def _check_budget(self):
+        if self._stop_event is not None and self._stop_event.is_set():
+            raise SearchAborted()
+        if self._max_nodes is not None and self.nodes >= self._max_nodes:
+            raise SearchAborted()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchAborted()
+        self._next_budget_check = min(self.nodes + BUDGET_CHECK_INTERVAL, self._max_nodes or math.inf)
+
+    def get_best_move(self, board, depth=None, time_limit=None, max_nodes=None) -> Optional[Tuple[Tuple[int, int], Move]]:
+        return self.search(board, depth, time_limit=time_limit, max_nodes=max_nodes).best_move
+
+    def advance_root(self, board, move):
+        """
+        Keep the subtree searched below move as the tree for the next search and release the rest.
+        board is the position before move is played (it is left unchanged), move is packed or a (position, Move) pair
+        """
+        if not isinstance(move, int):
+            move = move_to_packed(*move)
+        child = None
+        if self.root is not None and self.root_hash == board.hash and self.root.children:
+            child = next((child for child in self.root.children if child.move == move), None)
+        board.make_packed_move(move)
+        self.root, self.root_hash = child, board.hash if child is not None else None
+        board.unmake_move()
 
     def build_tree(self, board):
-        root = GameNode(board, PieceColor.RED, None, None, self.score_board(board), 0)
-
-        self.build_tree_helper(root)
-
-
-        
-    def build_tree_helper(self, node):
-        if node.depth == 5:
-            return
-        next_boards = node.board.get_next_moves()
-        node.children = []
-        
-        for new_board in next_boards:
-            score = self.score_board(new_board)
-            new_node = GameNode(new_board, node.board.next_turn, node, None, score, node.depth + 1)
-            node.children.append(new_node)
-
-        children = node.children
-        if node.turn == PieceColor.RED:
-            children.sort(key=lambda x: x.score)
+        result = self.search(board)
+        print(f"Completed search. Depth: {result.depth} Score: {result.score} Nodes: {result.nodes}")
+        return result
+
+    def _search_root(self, root, board, depth, alpha, beta, pv):
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.nodes_by_ply[0] += 1
+        if not root.children:
+            return self.evaluate(board)
+
+        best_score = -INFINITY
+        for child in root.children:
+            child_pv = []
+            child.score = self._search_move(board, child.move, depth, alpha, beta, 0, child_pv,
+                                            child if self.tree_depth > 1 else None)
+            if child.score > best_score:
+                best_score = child.score
+                if child.score > alpha:
+                    alpha = child.score
+                    pv[:] = [child.move] + child_pv
+                    if alpha >= beta:
+                        if stats is not None:
+                            stats.beta_cutoffs += 1
+                        break
+
+        # Best first for the next iteration. sort is stable so ties keep their previous order
+        root.children.sort(key=lambda child: child.score, reverse=True)
+        return best_score
+
+    def _search_move(self, board, move, depth, alpha, beta, ply, pv, node=None):
+        """
+        Make move, search the resulting position and unmake it.
+        Returns the score from the point of view of the player making move
+        """
+        if self.stats is not None:
+            self.stats.moves_searched += 1
+        eliminated_code = self._make_move(board, move)
+        if eliminated_code & ~(SILVER_BIT | ROTATION_MASK) == PHAROAH_CODE:
+            score = _game_over_score(board, eliminated_code, ply)
         else:
-            children.sort(key=lambda x: x.score, reverse=True)
-        
-        for child in children[:5]:
-            self.build_tree_helper(child)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1, pv, node)
+        self._unmake_move(board)
+        return score
+
+    def _negamax(self, board, depth, alpha, beta, ply, pv, node=None):
+        """
+        node is this position's GameNode if it is kept in the tree, None otherwise
+        """
+        self.nodes += 1
+        if self.nodes >= self._next_budget_check:
+            self._check_budget()
+        stats = self.stats
+        if stats is not None:
+            stats.nodes_by_ply[ply] += 1
+        if depth == 0:
+            if self.quiescence_depth:
+                return self._quiesce(board, alpha, beta, ply, self.quiescence_depth)
+            return self.evaluate(board)
 
-        if node.turn == PieceColor.RED:
-            node.score = max(child.score for child in children[:5])
+        tt = self.transposition_table
+        tt_move = None
+        if tt is not None:
+            # Entries of a mirrored key hold the best move as played in the mirrored position
+            key = board.hash
+            mirrored = self.symmetric_tt and board.mirror_hash < key
+            if mirrored:
+                key = board.mirror_hash
+            entry = tt.probe(key)
+            if stats is not None:
+                stats.tt_probes += 1
+                stats.tt_hits += entry is not None
+            if entry is not None:
+                tt_depth, tt_score, tt_bound, tt_move = entry
+                if mirrored and tt_move is not None:
+                    tt_move = mirror_packed_move(tt_move, board.squares[N_SQUARES - 1 - (tt_move & SQUARE_MASK)])
+                if tt_depth >= depth:
+                    tt_score = _score_from_tt(tt_score, ply)
+                    cutoff = (tt_bound == EXACT or (tt_bound == LOWER_BOUND and tt_score >= beta)
+                              or (tt_bound == UPPER_BOUND and tt_score <= alpha))
+                    if cutoff:
+                        if stats is not None:
+                            stats.tt_cutoffs += 1
+                        if tt_bound == EXACT and tt_move is not None:
+                            pv[:] = [tt_move]
+                        return tt_score
+
+        threat_map = None
+        moves = None
+        if self.threat_analysis and depth >= THREAT_MIN_DEPTH:
+            moves = board.generate_moves()
+            threat_map = analyze_threats(board, moves=moves)
+            if threat_map.winning_moves:
+                if stats is not None:
+                    stats.threat_wins += 1
+                pv[:] = [threat_map.winning_moves[0]]
+                return WIN_SCORE - ply - 1
+
+        moves = self._order_moves(board, ply, tt_move, threat_map, moves, depth)
+        if node is not None:
+            moves = self._order_by_children(node, moves, tt_move)
+            children = {child.move: child for child in node.children} if node.children else {}
+            if node.children is None:
+                node.children = []
+            keep_grandchildren = ply + 1 < self.tree_depth
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in moves:
+            child_pv = []
+            if node is None:
+                score = self._search_move(board, move, depth, alpha, beta, ply, child_pv)
+            else:
+                child = children.get(move)
+                if child is None:
+                    child = GameNode(move)
+                    node.children.append(child)
+                score = self._search_move(board, move, depth, alpha, beta, ply, child_pv,
+                                          child if keep_grandchildren else None)
+                child.score = score
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + child_pv
+                    if alpha >= beta:
+                        if stats is not None:
+                            stats.beta_cutoffs += 1
+                        if self.move_ordering:
+                            self._add_cutoff(move, depth, ply)
+                        break
+
+        if node is not None:
+            node.children.sort(key=lambda child: child.score, reverse=True)
+
+        if best_score == -INFINITY:
+            # No legal moves
+            return self.evaluate(board)
+
+        if tt is not None:
+            if best_score <= original_alpha:
+                bound = UPPER_BOUND
+            elif best_score >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            if bound == UPPER_BOUND:
+                best_move = None
+            elif mirrored:
+                best_move = board.mirror_move(best_move)
+            tt.store(key, depth, _score_to_tt(best_score, ply), bound, best_move)
+        return best_score
+
+    def _quiesce(self, board, alpha, beta, ply, depth):
+        """
+        Score of board with only moves that eliminate an opponent piece searched, up to depth plies. The side to
+        move can also stand pat on the static score
+        """
+        if depth < self.quiescence_depth:
+            # The horizon node itself was counted by _negamax
+            self.nodes += 1
+            if self.nodes >= self._next_budget_check:
+                self._check_budget()
+            if self.stats is not None:
+                self.stats.quiescence_nodes += 1
+        best_score = self.evaluate(board)
+        if depth == 0 or best_score >= beta:
+            return best_score
+        alpha = max(alpha, best_score)
+
+        for move in self._capture_moves(board):
+            eliminated_code = self._make_move(board, move)
+            if eliminated_code & ~(SILVER_BIT | ROTATION_MASK) == PHAROAH_CODE:
+                score = _game_over_score(board, eliminated_code, ply)
+            else:
+                score = -self._quiesce(board, -beta, -alpha, ply + 1, depth - 1)
+            self._unmake_move(board)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    @staticmethod
+    def _capture_moves(board):
+        """
+        Moves of the side to move whose laser eliminates an opponent piece, most valuable victim first.
+        Moves off the laser path all eliminate whatever the laser hits now, so one of them stands for all
+        """
+        color = board.next_turn
+        opponent_bit = SILVER_BIT if color == PieceColor.RED else 0
+        path_mask = laser_path_mask(board, color)
+        hit_idx = board._fire_laser(color)
+        standing_code = board.squares[hit_idx] if hit_idx is not None else 0
+        if (standing_code & SILVER_BIT) != opponent_bit:
+            standing_code = 0
+
+        captures = []
+        for move in board.generate_moves():
+            if touches(move, path_mask):
+                eliminated_code = board.peek_laser(move)
+                if eliminated_code and (eliminated_code & SILVER_BIT) == opponent_bit:
+                    captures.append((abs(MATERIAL_BY_CODE[eliminated_code]), move))
+            elif standing_code:
+                captures.append((abs(MATERIAL_BY_CODE[standing_code]), move))
+                standing_code = 0
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        return [move for _, move in captures]
+
+    def _add_cutoff(self, move, depth, ply):
+        killers = self._killers[ply] if ply < len(self._killers) else None
+        if killers is not None and killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self._history[move] = self._history.get(move, 0) + depth * depth
+
+    def _sort_moves(self, board, ply, moves):
+        """
+        moves sorted by the move_ordering heuristics: laser path, then killers, then history
+        """
+        path_mask = laser_path_mask(board, board.next_turn)
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        history = self._history
+
+        def order(move):
+            score = history.get(move, 0)
+            if (path_mask >> (move & SQUARE_MASK)) & 1 or (path_mask >> ((move >> TO_SHIFT) & SQUARE_MASK)) & 1:
+                score += LASER_PATH_BONUS
+            elif move in killers:
+                score += KILLER_BONUS
+            return -score
+        moves.sort(key=order)
+        return moves
+
+    @staticmethod
+    def _order_by_children(node, moves, first_move=None, n_children=1):
+        """
+        moves with first_move (if it is one of them) first, then the best n_children already searched from node.
+        Below the root the scores of the other children are mostly bounds, so by default only the best one is used
+        """
+        if not node.children:
+            return moves
+        move_set = set(moves)
+        searched = [child.move for child in node.children[:n_children] if child.move in move_set and child.move != first_move]
+        if first_move in move_set:
+            searched.insert(0, first_move)
+        searched_set = set(searched)
+        return searched + [move for move in moves if move not in searched_set]
+
+    def _order_moves(self, board, ply, tt_move=None, threat_map=None, moves=None, depth=ORDERING_MIN_DEPTH):
+        """
+        Moves to search at ply (moves if they are already generated). The transposition table move goes first, then
+        the previous iteration's principal variation move, then moves that may block a threat of threat_map. With a
+        beam width only the best children by static score are kept
+        """
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        if self.beam_width is not None:
+            # Score all siblings at once, best first for the player to move. The sort is stable so ties keep
+            # generation order
+            moves, stack = board.get_child_stack(moves)
+            scores = self.evaluator.evaluate_batch(stack)
+            if board.next_turn == PieceColor.RED:
+                scores = -scores
+            if stats is not None:
+                stats.moves_generated += len(moves)
+                stats.beam_pruned += max(0, len(moves) - self.beam_width)
+            moves = [moves[i] for i in np.argsort(scores, kind="stable")[:self.beam_width]]
         else:
-            node.score = min(child.score for child in children[:5])
+            if moves is None:
+                moves = board.generate_moves()
+            if stats is not None:
+                stats.moves_generated += len(moves)
+            if self.move_ordering and depth >= ORDERING_MIN_DEPTH:
+                moves = self._sort_moves(board, ply, moves)
+
+        if threat_map is not None and threat_map.must_block:
+            block_mask = threat_map.block_mask
+            moves = [move for move in moves if touches(move, block_mask)] + [move for move in moves if not touches(move, block_mask)]
+        if ply < len(self._prev_pv):
+            pv_move = self._prev_pv[ply]
+            if pv_move in moves:
+                moves.remove(pv_move)
+                moves.insert(0, pv_move)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        if stats is not None:
+            stats.phase_times["move_ordering"] += time.perf_counter() - start
+        return moves
+
+def _game_over_score(board, eliminated_code, ply):
+    """
+    Score for the player who just moved when their move at ply eliminated a Pharoah: whoever still has one won
+    """
+    won = bool(eliminated_code & SILVER_BIT) == (board.next_turn == PieceColor.SILVER)
+    return WIN_SCORE - ply - 1 if won else -(WIN_SCORE - ply - 1)
+
+def _score_to_tt(score, ply):
+    """
+    Win/loss scores count plies from the root, the table stores them counted from the node
+    """
+    if score > WIN_THRESHOLD:
+        return score + ply
+    if score < -WIN_THRESHOLD:
+        return score - ply
+    return score
 
-        if node.depth < 2:
-            print(f"Completed search. Depth: {node.depth} Score: {node.score}")
-    
+def _score_from_tt(score, ply):
+    if score > WIN_THRESHOLD:
+        return score - ply
+    if score < -WIN_THRESHOLD:
+        return score + ply
+    return score
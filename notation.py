@@ -0,0 +1,303 @@
+import ast
+import os
+import re
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+from board import (DECODE, MIRROR_ZOBRIST_KEYS_ARRAY, N_SQUARES, RED_LASER_SQUARE, SILVER_LASER_SQUARE, ZOBRIST_KEYS_ARRAY,
+                   ZOBRIST_SILVER_TO_MOVE, Board)
+from evaluation import MATERIAL_BY_CODE_ARRAY
+from pieces import (PIECE_SHIFT, ROTATION_MASK, ROTATION_SHIFT, SILVER_BIT, SQUARE_MASK, SWAP_FLAG, TO_SHIFT, PieceColor,
+                    PieceType, Rotation, SPHINX_ROTATIONS, pack_move)
+
+# Text notation, FEN-like: "<rows> <side> <eliminated>"
+#   rows: the 8 rows from row 0, separated by "/". A piece is its letter, upper case for Red and lower case for
+#       Silver, followed by its Rotation value (0-7). A run of empty squares is its length (1-10)
+#   side: "r" or "s", the side to move
+#   eliminated: letters of the eliminated pieces, Red's upper case and Silver's lower case, or "-"
+# A piece always takes exactly one rotation digit, so the classic setup reads
+#   "X43A4K4A4P32/2P17/3p36/P11p51S1S71P31p7/P31p71s7s11P11p5/6P73/7p52/2p7a0k0a03x0 r -"
+PIECE_LETTERS = {
+    PieceType.PHAROAH: "K",
+    PieceType.SCARAB: "S",
+    PieceType.PYRAMID: "P",
+    PieceType.ANUBIS: "A",
+    PieceType.SPHINX: "X",
+}
+LETTER_PIECES = {letter: piece for piece, letter in PIECE_LETTERS.items()}
+
+# Binary encoding, RECORD_BYTES per position: the 80 square codes (see pieces.py), 1 byte for the side to move
+# (0 Red, 1 Silver), then how many pieces of each PieceType value 1-5 Red and then Silver lost
+SIDE_OFFSET = N_SQUARES
+ELIMINATED_OFFSET = N_SQUARES + 1
+N_PIECE_TYPES = 5
+RECORD_BYTES = ELIMINATED_OFFSET + 2 * N_PIECE_TYPES
+
+def to_notation(board) -> str:
+    rows = []
+    for r in range(Board.n_rows):
+        row = []
+        empty = 0
+        for code in board.squares[r * Board.n_cols:(r + 1) * Board.n_cols]:
+            if not code:
+                empty += 1
+                continue
+            if empty:
+                row.append(str(empty))
+                empty = 0
+            piece, color, rotation = DECODE[code]
+            letter = PIECE_LETTERS[piece]
+            row.append(f"{letter if color == PieceColor.RED else letter.lower()}{rotation.value}")
+        if empty:
+            row.append(str(empty))
+        rows.append("".join(row))
+
+    side = "r" if board.next_turn == PieceColor.RED else "s"
+    eliminated = ("".join(PIECE_LETTERS[piece] for piece in board.eliminated_pieces_red)
+                  + "".join(PIECE_LETTERS[piece].lower() for piece in board.eliminated_pieces_silver))
+    return f"{'/'.join(rows)} {side} {eliminated or '-'}"
+
+# Rotations each piece can have: scarabs and pyramids face diagonally (scarabs only NE or NW), the others
+# orthogonally. Sphinxes also have to be on their laser square (see SPHINX_ROTATIONS)
+ORTHOGONAL = frozenset((Rotation.N, Rotation.E, Rotation.S, Rotation.W))
+ALLOWED_ROTATIONS = {
+    PieceType.PHAROAH: ORTHOGONAL,
+    PieceType.SCARAB: frozenset((Rotation.NE, Rotation.NW)),
+    PieceType.PYRAMID: frozenset((Rotation.NE, Rotation.SE, Rotation.SW, Rotation.NW)),
+    PieceType.ANUBIS: ORTHOGONAL,
+    PieceType.SPHINX: ORTHOGONAL,
+}
+
+def check_pieces(squares, text):
+    """
+    Raise a ValueError naming text if a piece of squares has a rotation it can't have, or a sphinx is off its square.
+    The search assumes neither happens
+    """
+    for idx, code in enumerate(squares):
+        if not code:
+            continue
+        piece, color, rotation = DECODE[code]
+        if rotation not in ALLOWED_ROTATIONS[piece]:
+            raise ValueError(f"A {piece.name.lower()} can't face {rotation.name}, at {divmod(idx, Board.n_cols)} "
+                             f"in {text!r}")
+        if piece == PieceType.SPHINX:
+            laser_square = RED_LASER_SQUARE if color == PieceColor.RED else SILVER_LASER_SQUARE
+            if idx != laser_square or (idx, rotation.value) not in SPHINX_ROTATIONS:
+                raise ValueError(f"The {color.name.lower()} sphinx must be at {divmod(laser_square, Board.n_cols)} "
+                                 f"facing into the board, not at {divmod(idx, Board.n_cols)} facing {rotation.name} "
+                                 f"in {text!r}")
+
+def from_notation(text) -> Board:
+    fields = text.split()
+    if len(fields) != 3:
+        raise ValueError(f"Expected '<rows> <side> <eliminated>', got {text!r}")
+    rows, side, eliminated = fields
+
+    rows = rows.split("/")
+    if len(rows) != Board.n_rows:
+        raise ValueError(f"Expected {Board.n_rows} rows, got {len(rows)} in {text!r}")
+    squares = bytearray(N_SQUARES)
+    for r, row in enumerate(rows):
+        c = 0
+        i = 0
+        while i < len(row):
+            char = row[i]
+            if char.isdigit():
+                # Empty run, possibly two digits long
+                j = i + 1
+                while j < len(row) and row[j].isdigit():
+                    j += 1
+                c += int(row[i:j])
+                i = j
+                continue
+            piece = LETTER_PIECES.get(char.upper())
+            if piece is None or i + 1 >= len(row) or not "0" <= row[i + 1] <= "7":
+                raise ValueError(f"Invalid piece {row[i:i + 2]!r} in row {r} of {text!r}")
+            if c >= Board.n_cols:
+                raise ValueError(f"Row {r} of {text!r} is longer than {Board.n_cols} squares")
+            squares[r * Board.n_cols + c] = ((piece.value << PIECE_SHIFT) | (0 if char.isupper() else SILVER_BIT)
+                                             | int(row[i + 1]))
+            c += 1
+            i += 2
+        if c != Board.n_cols:
+            raise ValueError(f"Row {r} of {text!r} has {c} squares instead of {Board.n_cols}")
+
+    if side not in ("r", "s"):
+        raise ValueError(f"Side to move must be 'r' or 's', got {side!r}")
+    eliminated_red, eliminated_silver = [], []
+    if eliminated != "-":
+        for char in eliminated:
+            piece = LETTER_PIECES.get(char.upper())
+            if piece is None:
+                raise ValueError(f"Invalid eliminated piece {char!r} in {text!r}")
+            (eliminated_red if char.isupper() else eliminated_silver).append(piece)
+
+    check_pieces(squares, text)
+    return Board(squares, eliminated_red, eliminated_silver, PieceColor.RED if side == "r" else PieceColor.SILVER)
+
+# PieceType.SPHINX, PieceColor.RED, Rotation.S, ... as written by repr-like printing of config tuples
+_ENUM_NAME = re.compile(r"\b(PieceType|PieceColor|Rotation)\.([A-Z]+)\b")
+_ENUMS = {"PieceType": PieceType, "PieceColor": PieceColor, "Rotation": Rotation}
+
+def from_config_text(text) -> Board:
+    """
+    Board.from_config_list of a written out list of (row, col, piece, color, rotation) tuples. piece, color and
+    rotation can be enum members (PieceType.SPHINX), their names ("SPHINX") or their values (5)
+    """
+    text = _ENUM_NAME.sub(lambda match: str(_ENUMS[match.group(1)][match.group(2)].value), text)
+    try:
+        config = ast.literal_eval(text)
+    except (ValueError, SyntaxError) as e:
+        raise ValueError(f"Invalid config list {text!r}: {e}") from None
+
+    def to_enum(enum, value):
+        return enum[value] if isinstance(value, str) else enum(value)
+
+    try:
+        config_list = [(r, c, to_enum(PieceType, piece), to_enum(PieceColor, color), to_enum(Rotation, rotation))
+                       for r, c, piece, color, rotation in config]
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid config list {text!r}: {e}") from None
+    board = Board.from_config_list(config_list)
+    check_pieces(board.squares, text)
+    return board
+
+def parse_position(text) -> Board:
+    """
+    Board of a text notation or, if text starts with [ or (, of a config list (see from_config_text)
+    """
+    text = text.strip()
+    if text[:1] in ("[", "("):
+        return from_config_text(text)
+    return from_notation(text)
+
+# Move text: from row and column, to row and column, the new Rotation name and "x" for a swap, e.g. "3020N" or
+# "4544SEx". A rotation in place has the same from and to square
+_MOVE_TEXT = re.compile(r"([0-7])([0-9])([0-7])([0-9])([NESW]{1,2})(x?)")
+
+def move_to_text(packed_move) -> str:
+    from_idx = packed_move & SQUARE_MASK
+    to_idx = (packed_move >> TO_SHIFT) & SQUARE_MASK
+    rotation = Rotation((packed_move >> ROTATION_SHIFT) & ROTATION_MASK)
+    return f"{from_idx // 10}{from_idx % 10}{to_idx // 10}{to_idx % 10}{rotation.name}{'x' if packed_move & SWAP_FLAG else ''}"
+
+def move_from_text(text) -> int:
+    """
+    Packed move of a move text. Only the syntax is checked, not whether the move is legal anywhere
+    """
+    match = _MOVE_TEXT.fullmatch(text.strip())
+    if match is None or match.group(5) not in Rotation.__members__:
+        raise ValueError(f"Invalid move {text!r}")
+    from_row, from_col, to_row, to_col = (int(digit) for digit in match.group(1, 2, 3, 4))
+    return pack_move(from_row * 10 + from_col, to_row * 10 + to_col, Rotation[match.group(5)].value, bool(match.group(6)))
+
+def encode_boards(boards: Iterable[Board]) -> np.ndarray:
+    """
+    (N, RECORD_BYTES) uint8 array of the binary encoding of boards
+    """
+    boards = list(boards)
+    records = np.zeros((len(boards), RECORD_BYTES), dtype=np.uint8)
+    if not boards:
+        return records
+    records[:, :N_SQUARES] = np.frombuffer(b"".join(bytes(board.squares) for board in boards),
+                                           dtype=np.uint8).reshape(len(boards), N_SQUARES)
+    records[:, SIDE_OFFSET] = [board.next_turn == PieceColor.SILVER for board in boards]
+
+    # Count eliminated pieces of all boards at once: one bincount over (board, color, piece) slots
+    slots = [(i * 2 * N_PIECE_TYPES + piece.value - 1)
+             for i, board in enumerate(boards) for piece in board.eliminated_pieces_red]
+    slots += [(i * 2 * N_PIECE_TYPES + N_PIECE_TYPES + piece.value - 1)
+              for i, board in enumerate(boards) for piece in board.eliminated_pieces_silver]
+    if slots:
+        counts = np.bincount(slots, minlength=len(boards) * 2 * N_PIECE_TYPES)
+        records[:, ELIMINATED_OFFSET:] = counts.reshape(len(boards), 2 * N_PIECE_TYPES)
+    return records
+
+def _as_records(records) -> np.ndarray:
+    if isinstance(records, (bytes, bytearray, memoryview)):
+        records = np.frombuffer(records, dtype=np.uint8)
+    records = np.asarray(records, dtype=np.uint8).reshape(-1, RECORD_BYTES)
+    if (records[:, SIDE_OFFSET] > 1).any():
+        raise ValueError("Invalid side to move in position records")
+    return records
+
+def records_to_stack(records):
+    """
+    Square codes and sides to move of binary encodings without building Boards.
+    Returns the (N, 8, 10) uint8 stack (as used by batch_laser and Evaluator.evaluate_batch) and an array of
+    PieceColor values
+    """
+    records = _as_records(records)
+    stack = records[:, :N_SQUARES].reshape(-1, Board.n_rows, Board.n_cols)
+    sides = np.where(records[:, SIDE_OFFSET] == 1, PieceColor.SILVER.value, PieceColor.RED.value)
+    return stack, sides
+
+def decode_boards(records) -> List[Board]:
+    """
+    Boards of an (N, RECORD_BYTES) array (or the raw bytes) of binary encodings
+    """
+    records = _as_records(records)
+    squares = records[:, :N_SQUARES]
+    silver = records[:, SIDE_OFFSET] == 1
+
+    # Hashes, occupancy and material of every board at once instead of in each Board's constructor
+    hashes = np.bitwise_xor.reduce(ZOBRIST_KEYS_ARRAY[squares, np.arange(N_SQUARES)], axis=1)
+    hashes[silver] ^= np.uint64(ZOBRIST_SILVER_TO_MOVE)
+    mirror_hashes = np.bitwise_xor.reduce(MIRROR_ZOBRIST_KEYS_ARRAY[squares, np.arange(N_SQUARES)], axis=1)
+    mirror_hashes[~silver] ^= np.uint64(ZOBRIST_SILVER_TO_MOVE)
+    occupancy = np.packbits(squares != 0, axis=1, bitorder="little")
+    material = MATERIAL_BY_CODE_ARRAY[squares].sum(axis=1)
+
+    piece_types = [PieceType(value) for value in range(1, N_PIECE_TYPES + 1)]
+    boards = []
+    square_bytes = squares.tobytes()
+    counts = records[:, ELIMINATED_OFFSET:].tolist()
+    for i in range(len(records)):
+        eliminated_red = [piece for piece, count in zip(piece_types, counts[i][:N_PIECE_TYPES]) for _ in range(count)]
+        eliminated_silver = [piece for piece, count in zip(piece_types, counts[i][N_PIECE_TYPES:]) for _ in range(count)]
+        boards.append(Board(bytearray(square_bytes[i * N_SQUARES:(i + 1) * N_SQUARES]), eliminated_red, eliminated_silver,
+                            PieceColor.SILVER if silver[i] else PieceColor.RED,
+                            occupancy=int.from_bytes(occupancy[i].tobytes(), "little"),
+                            hash=int(hashes[i]), material=int(material[i]), mirror_hash=int(mirror_hashes[i])))
+    return boards
+
+def encode_board(board) -> bytes:
+    return encode_boards([board])[0].tobytes()
+
+def decode_board(record) -> Board:
+    return decode_boards(record)[0]
+
+def write_positions(path, boards, append=False):
+    """
+    Write boards to a file of fixed-size binary records
+    """
+    with open(path, "ab" if append else "wb") as f:
+        f.write(encode_boards(boards).tobytes())
+
+def read_positions(path, batch_size=4096) -> Iterator[Board]:
+    """
+    Boards of a file written by write_positions, decoded batch_size records at a time through a memory map
+    """
+    if not os.path.getsize(path):
+        return
+    records = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(records) % RECORD_BYTES:
+        raise ValueError(f"{path} is not a whole number of {RECORD_BYTES} byte position records")
+    records = records.reshape(-1, RECORD_BYTES)
+    for start in range(0, len(records), batch_size):
+        yield from decode_boards(records[start:start + batch_size])
+
+def iter_positions(path) -> Iterator[Board]:
+    """
+    Boards of a positions file, read lazily: binary records (see write_positions) if path ends in .bin,
+    otherwise one position per line (see parse_position). Blank lines and lines starting with # are skipped
+    """
+    if path.endswith(".bin"):
+        yield from read_positions(path)
+        return
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield parse_position(line)
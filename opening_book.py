@@ -0,0 +1,156 @@
+import argparse
+import mmap
+import struct
+import sys
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from board import N_SQUARES, mirror_packed_move
+from game_tree import GameTree
+from pieces import PHAROAH_CODE, ROTATION_MASK, SILVER_BIT, SQUARE_MASK
+from positions import initialize_classic_board
+
+# File layout: HEADER (magic, record count) then the records sorted by key, each RECORD_FORMAT:
+# Board.canonical_key, best move as played in the canonical position (see Board.canonical), score for the side to
+# move and search depth
+MAGIC = b"LCBOOK01"
+HEADER_FORMAT = "<8sQ"
+HEADER_BYTES = struct.calcsize(HEADER_FORMAT)
+RECORD_FORMAT = "<QIiH"
+RECORD_BYTES = struct.calcsize(RECORD_FORMAT)
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("move", "<u4"), ("score", "<i4"), ("depth", "<u2")])
+assert RECORD_DTYPE.itemsize == RECORD_BYTES
+
+class OpeningBook:
+    """
+    Read-only view of a book file. The file is memory mapped and looked up with binary search, so opening a book
+    reads nothing but the header
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_records = struct.unpack_from(HEADER_FORMAT, self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+        if len(self._mmap) != HEADER_BYTES + self.n_records * RECORD_BYTES:
+            raise ValueError(f"{path} should hold {self.n_records} records but has {len(self._mmap)} bytes")
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.n_records
+
+    def _find(self, key) -> Optional[Tuple[int, int, int]]:
+        """
+        (move, score, depth) of the record with key, None if there is none
+        """
+        lo, hi = 0, self.n_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER_BYTES + mid * RECORD_BYTES
+            mid_key = struct.unpack_from("<Q", self._mmap, offset)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return struct.unpack_from(RECORD_FORMAT, self._mmap, offset)[1:]
+        return None
+
+    def probe(self, board) -> Optional[Tuple[int, int, int]]:
+        """
+        (packed move, score for the side to move, depth it was searched to) for board, None if it isn't in the book
+        or the stored move is not legal here (a hash collision)
+        """
+        found = self._find(board.canonical_key)
+        if found is None:
+            return None
+        move, score, depth = found
+        if board.mirror_hash < board.hash:
+            move = mirror_packed_move(move, board.squares[N_SQUARES - 1 - (move & SQUARE_MASK)])
+        if move not in board.generate_moves():
+            return None
+        return move, score, depth
+
+def _best_moves(tree, board, depth, width):
+    """
+    The width best (move, score) of board by search, best first
+    """
+    moves = board.generate_moves()
+    best = []
+    while moves and len(best) < width:
+        result = tree.search(board, depth, root_moves=moves)
+        if not result.pv:
+            break
+        best.append((result.pv[0], result.score))
+        moves.remove(result.pv[0])
+    return best
+
+def build_book(path, board=None, plies=4, width=3, depth=4, verbose=False, **tree_kwargs) -> int:
+    """
+    Search every position reached from board (the classic setup by default) in less than plies plies when both
+    sides play one of their width best moves, and write the best move of each to a book file at path.
+    Positions and their mirrors share a record. Returns the number of records
+    """
+    board = initialize_classic_board() if board is None else board.copy()
+    tree = GameTree(depth, **tree_kwargs)
+    records = {}
+    start = time.perf_counter()
+
+    def visit(ply):
+        key = board.canonical_key
+        if key in records:
+            return
+        best = _best_moves(tree, board, depth, width if ply + 1 < plies else 1)
+        if not best:
+            return
+        move, score = best[0]
+        records[key] = (board.mirror_move(move) if board.mirror_hash < board.hash else move, score, depth)
+        if verbose:
+            print(f"{len(records)} positions, ply {ply}, {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        if ply + 1 >= plies:
+            return
+        for move, _ in best:
+            eliminated_code = board.make_packed_move(move)
+            if eliminated_code & ~(SILVER_BIT | ROTATION_MASK) != PHAROAH_CODE:
+                visit(ply + 1)
+            board.unmake_move()
+
+    visit(0)
+    write_book(path, records)
+    return len(records)
+
+def write_book(path, records):
+    """
+    records: {canonical key: (move in the canonical position, score, depth)}
+    """
+    table = np.array([(key, move, score, depth) for key, (move, score, depth) in records.items()], dtype=RECORD_DTYPE)
+    table.sort(order="key")
+    with open(path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, len(table)))
+        f.write(table.tobytes())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book from the classic setup")
+    parser.add_argument("output", help="book file to write")
+    parser.add_argument("--plies", type=int, default=4, help="plies from the start position covered by the book")
+    parser.add_argument("--width", type=int, default=3, help="moves followed from every position")
+    parser.add_argument("--depth", type=int, default=4, help="search depth of every book position")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    n_records = build_book(args.output, plies=args.plies, width=args.width, depth=args.depth, verbose=args.verbose)
+    print(f"Wrote {n_records} positions to {args.output}")
+
+if __name__ == "__main__":
+    main()
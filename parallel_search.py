@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List
+
+from board import Board
+from game_tree import INFINITY, GameTree, SearchResult
+
+def _search_root_move(task) -> SearchResult:
+    """
+    Worker: search one root move of a compact board with a fresh GameTree
+    """
+    compact_board, move, depth, alpha, beta, tree_kwargs = task
+    board = Board.from_compact(compact_board)
+    return GameTree(**tree_kwargs).search(board, depth, root_moves=[move], alpha=alpha, beta=beta)
+
+def _run_tasks(tasks, executor) -> List[SearchResult]:
+    if executor is None:
+        return list(map(_search_root_move, tasks))
+    return list(executor.map(_search_root_move, tasks))
+
+def parallel_search(board, depth=5, workers=None, **tree_kwargs) -> SearchResult:
+    """
+    Root-parallel search over a process pool.
+    A shallower serial search picks the expected best root move, which is then searched to depth with a full
+    window. The other root moves are split across the workers with a null window around that score, and the
+    ones that turn out better are searched again with an open window.
+    Workers get the compact board encoding and a root move, and each task uses a fresh GameTree, so the result
+    does not depend on scheduling. Ties go to the expected best move, then to generation order.
+    workers: number of processes, os.cpu_count() by default. With 1 everything runs in this process.
+    tree_kwargs: passed on to GameTree (beam_width, tt_memory_mb, evaluator)
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    tree = GameTree(**tree_kwargs)
+    if depth <= 1:
+        return tree.search(board, depth)
+
+    shallow = tree.search(board, depth - 1)
+    if not shallow.pv:
+        return shallow
+    first_move = shallow.pv[0]
+    best = tree.search(board, depth, root_moves=[first_move])
+    nodes = shallow.nodes + best.nodes
+
+    other_moves = [move for move in board.generate_moves() if move != first_move]
+    compact_board = board.to_compact()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and other_moves else None
+    try:
+        scout_tasks = [(compact_board, move, depth, best.score, best.score + 1, tree_kwargs) for move in other_moves]
+        scout_results = _run_tasks(scout_tasks, executor)
+        nodes += sum(result.nodes for result in scout_results)
+
+        fail_high_moves = [move for move, result in zip(other_moves, scout_results) if result.score > best.score]
+        research_tasks = [(compact_board, move, depth, best.score, INFINITY, tree_kwargs) for move in fail_high_moves]
+        research_results = _run_tasks(research_tasks, executor)
+        nodes += sum(result.nodes for result in research_results)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return combine_root_results([best] + research_results, nodes)
+
+def imap_unordered(executor, fn, tasks, max_pending):
+    """
+    executor.map that yields results as they finish and only keeps max_pending tasks submitted at a time,
+    so tasks can be an endless generator
+    """
+    pending = set()
+    for task in tasks:
+        pending.add(executor.submit(fn, task))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+def combine_root_results(results: List[SearchResult], nodes) -> SearchResult:
+    """
+    Keep the highest scoring result with a principal variation, the first one on ties
+    """
+    best = results[0]
+    for result in results[1:]:
+        if result.pv and result.score > best.score:
+            best = result
+    return SearchResult(best.score, best.depth, best.pv, nodes)
@@ -45,12 +45,127 @@ TRANSLATE_MOVES = list(itertools.product(
     ))
 TRANSLATE_MOVES.remove((0, 0))
 
+LASER_DIRECTIONS = [Rotation.N, Rotation.E, Rotation.S, Rotation.W]
+
+# Mirror pieces: piece rotation -> {incoming laser direction: reflected laser direction}.
+# Any other laser direction hitting a pyramid eliminates it.
+# If scarab is NE: N->W, W->N, S->E, E->S
+# If scarab is NW: N->E, E->N, S->W, W->S
+SCARAB_REFLECTIONS = {
+    Rotation.NE: {Rotation.N: Rotation.W, Rotation.W: Rotation.N, Rotation.S: Rotation.E, Rotation.E: Rotation.S},
+    Rotation.NW: {Rotation.N: Rotation.E, Rotation.E: Rotation.N, Rotation.S: Rotation.W, Rotation.W: Rotation.S},
+}
+PYRAMID_REFLECTIONS = {
+    Rotation.NE: {Rotation.S: Rotation.E, Rotation.W: Rotation.N},
+    Rotation.NW: {Rotation.S: Rotation.W, Rotation.E: Rotation.N},
+    Rotation.SE: {Rotation.N: Rotation.E, Rotation.W: Rotation.S},
+    Rotation.SW: {Rotation.N: Rotation.W, Rotation.E: Rotation.S},
+}
+
+# Laser outcome values in REFLECTION_TABLE
+NOT_ELIMINATED = 0
+ELIMINATED = 1
+NO_DIRECTION = -1
+
+def _get_laser_outcome(piece_type, laser_rotation, piece_rotation):
+    """
+    (eliminated, new laser direction value) for a laser hitting a piece, None if the combination is invalid
+    """
+    if piece_type == PieceType.SCARAB:
+        if piece_rotation not in SCARAB_REFLECTIONS:
+            return None
+        return (NOT_ELIMINATED, SCARAB_REFLECTIONS[piece_rotation][laser_rotation].value)
+    elif piece_type == PieceType.PYRAMID:
+        if piece_rotation not in PYRAMID_REFLECTIONS:
+            return None
+        reflections = PYRAMID_REFLECTIONS[piece_rotation]
+        if laser_rotation in reflections:
+            return (NOT_ELIMINATED, reflections[laser_rotation].value)
+        return (ELIMINATED, NO_DIRECTION)
+    elif piece_type == PieceType.ANUBIS:
+        # If laser comes from 180 degrees of the piece rotation is blocked, otherwise it is hit
+        if turn_180(piece_rotation) == laser_rotation:
+            return (NOT_ELIMINATED, NO_DIRECTION)
+        return (ELIMINATED, NO_DIRECTION)
+    elif piece_type == PieceType.PHAROAH:
+        return (ELIMINATED, NO_DIRECTION)
+    elif piece_type == PieceType.SPHINX:
+        return (NOT_ELIMINATED, NO_DIRECTION)
+    return None
+
+# REFLECTION_TABLE[piece type value][piece rotation value][laser direction value] -> (eliminated, new direction value)
+# where new direction is NO_DIRECTION if the laser stops. Invalid combinations are None.
+REFLECTION_TABLE = [
+    [
+        [
+            _get_laser_outcome(piece_type, laser_rotation, piece_rotation) if laser_rotation in LASER_DIRECTIONS else None
+            for laser_rotation in Rotation
+        ]
+        for piece_rotation in Rotation
+    ]
+    for piece_type in PieceType
+]
+
+def lookup_hit(piece_type, laser_rotation, piece_rotation) -> Tuple[bool, Optional[Rotation]]:
+    outcome = REFLECTION_TABLE[piece_type.value][piece_rotation.value][laser_rotation.value]
+    if outcome is None:
+        raise ValueError(f"Invalid laser rotation {laser_rotation} for {piece_type} with rotation {piece_rotation}")
+    eliminated, new_direction = outcome
+    return eliminated == ELIMINATED, Rotation(new_direction) if new_direction != NO_DIRECTION else None
+
 def in_bounds(position):
     return 0 <= position[0] and position[0] < 8 and 0 <= position[1] and position[1] < 10
 
 def add_move(position, move):
     return (position[0] + move[0], position[1] + move[1])
 
+# Square codes as stored on the board:
+#   bits 4-6: PieceType value, bit 3: set for SILVER, bits 0-2: Rotation value
+# An empty square is 0. Codes always fit in a byte.
+PIECE_SHIFT = 4
+SILVER_BIT = 8
+ROTATION_MASK = 7
+PHAROAH_CODE = PieceType.PHAROAH.value << PIECE_SHIFT
+SCARAB_CODE = PieceType.SCARAB.value << PIECE_SHIFT
+SPHINX_CODE = PieceType.SPHINX.value << PIECE_SHIFT
+
+# NEIGHBOURS[idx] holds the in-bounds squares one step away from square idx (r * 10 + c),
+# in TRANSLATE_MOVES order
+NEIGHBOURS = tuple(
+    tuple((r + dr) * 10 + c + dc for dr, dc in TRANSLATE_MOVES if in_bounds((r + dr, c + dc)))
+    for r in range(8) for c in range(10)
+)
+POSITIONS = [divmod(idx, 10) for idx in range(80)]
+ROTATIONS = list(Rotation)
+
+# Moves are packed into ints as
+#   bits 0-6: from square, bits 7-13: to square, bits 14-16: new rotation, bit 17: swap flag
+# A rotation has the same from and to square.
+TO_SHIFT = 7
+ROTATION_SHIFT = 14
+SWAP_FLAG = 1 << 17
+SQUARE_MASK = 127
+
+def pack_move(from_idx, to_idx, rotation, is_swap=False):
+    return from_idx | (to_idx << TO_SHIFT) | (rotation << ROTATION_SHIFT) | (SWAP_FLAG if is_swap else 0)
+
+def unpack_move(packed_move) -> Tuple[Tuple[int, int], Move]:
+    """
+    Packed move -> (position of the piece that moves, Move)
+    """
+    from_idx = packed_move & SQUARE_MASK
+    to_idx = (packed_move >> TO_SHIFT) & SQUARE_MASK
+    return POSITIONS[from_idx], Move(
+        POSITIONS[to_idx],
+        ROTATIONS[(packed_move >> ROTATION_SHIFT) & ROTATION_MASK],
+        from_idx != to_idx,
+        bool(packed_move & SWAP_FLAG))
+
+def move_to_packed(position, move) -> int:
+    from_idx = position[0] * 10 + position[1]
+    to_idx = move.position[0] * 10 + move.position[1] if move.is_position_new else from_idx
+    return pack_move(from_idx, to_idx, move.rotation.value, move.is_swap)
+
 class Piece:
     # Get all valid moves
     @staticmethod
@@ -58,23 +173,24 @@ class Piece:
         board,
         position,
     )  -> List[Move]:       
-        curr_rotation = board.get_rotation(position)
+        return [unpack_move(packed_move)[1] for packed_move in Piece.get_packed_moves(board.squares, position[0] * 10 + position[1])]
 
-        # Stored as ((r, c), rotation)
-        moves = []
+    @staticmethod
+    def get_packed_moves(squares, idx) -> List[int]:
+        curr_rotation = squares[idx] & ROTATION_MASK
 
         # Add the rotation
-        moves.append(Move(position, Rotation((curr_rotation.value + 2) % 8), False))
-        moves.append(Move(position, Rotation((curr_rotation.value - 2) % 8), False))
+        moves = [
+            idx | (idx << TO_SHIFT) | (((curr_rotation + 2) % 8) << ROTATION_SHIFT),
+            idx | (idx << TO_SHIFT) | (((curr_rotation - 2) % 8) << ROTATION_SHIFT),
+        ]
 
         # TODO should we check for validity here or not
         # Try moving
-        
-        for move in TRANSLATE_MOVES:
-            new_pos = add_move(position, move)
-            
-            if in_bounds(new_pos) and board.is_empty(new_pos):
-                moves.append(Move(new_pos, curr_rotation))
+        rotation_bits = idx | (curr_rotation << ROTATION_SHIFT)
+        for new_idx in NEIGHBOURS[idx]:
+            if not squares[new_idx]:
+                moves.append(rotation_bits | (new_idx << TO_SHIFT))
 
         return moves
 
@@ -83,23 +199,27 @@ class Scarab(Piece):
     def get_moves(board, position) -> List[Tuple[Tuple[int, int], Rotation]]:
         assert board.get_piece(position) == PieceType.SCARAB
 
-        curr_rotation = board.get_rotation(position)
- 
-        moves = []
+        return [unpack_move(packed_move)[1] for packed_move in Scarab.get_packed_moves(board.squares, position[0] * 10 + position[1])]
+
+    @staticmethod
+    def get_packed_moves(squares, idx) -> List[int]:
+        curr_rotation = squares[idx] & ROTATION_MASK
 
-        if curr_rotation == Rotation.NE:
-            moves.append(Move(position, Rotation.NW, False))
-        elif curr_rotation == Rotation.NW:
-            moves.append(Move(position, Rotation.NE, False))
+        if curr_rotation == Rotation.NE.value:
+            moves = [idx | (idx << TO_SHIFT) | (Rotation.NW.value << ROTATION_SHIFT)]
+        elif curr_rotation == Rotation.NW.value:
+            moves = [idx | (idx << TO_SHIFT) | (Rotation.NE.value << ROTATION_SHIFT)]
         else:
-            raise ValueError(f"Scarab can only have rotation of NW or NE, this scarab is {curr_rotation}")
+            raise ValueError(f"Scarab can only have rotation of NW or NE, this scarab is {ROTATIONS[curr_rotation]}")
 
-        # Add swap moves
-        for move in TRANSLATE_MOVES:
-            new_move = add_move(position, move)
-            if in_bounds(new_move):
-                if board.get_piece(new_move) != PieceType.SCARAB:
-                    moves.append(Move(new_move, curr_rotation, True, is_swap=not board.is_empty(new_move)))
+        # Add swap moves. Sphinxes never leave their corner, so they can't be swapped either
+        rotation_bits = idx | (curr_rotation << ROTATION_SHIFT)
+        for new_idx in NEIGHBOURS[idx]:
+            piece_bits = squares[new_idx] & ~(SILVER_BIT | ROTATION_MASK)
+            if not piece_bits:
+                moves.append(rotation_bits | (new_idx << TO_SHIFT))
+            elif piece_bits != SCARAB_CODE and piece_bits != SPHINX_CODE:
+                moves.append(rotation_bits | (new_idx << TO_SHIFT) | SWAP_FLAG)
 
         return moves
     
@@ -111,62 +231,40 @@ class Scarab(Piece):
             new_laser_rotation (Optional[Rotation]): The new laser rotation if reflected, None if piece is hit and eliminated
         -----> |<--
         """
-        """
-        If scarab is NE: N->W, W->N, S->E, E->S
-        If scarab is NW: N->E, E->N, S->W, W->S
-        """
-        if piece_rotation == Rotation.NE:
-            match laser_rotation:
-                case Rotation.N:
-                    return (False, Rotation.W)
-                case Rotation.W:
-                    return (False, Rotation.N)
-                case Rotation.S:
-                    return (False, Rotation.E)
-                case Rotation.E:
-                    return (False, Rotation.S)
-                case _:
-                    raise ValueError(f"Invalid laser rotation {laser_rotation}")
-        elif piece_rotation == Rotation.NW:
-            match laser_rotation:
-                case Rotation.N:
-                    return (False, Rotation.E)
-                case Rotation.E:
-                    return (False, Rotation.N)
-                case Rotation.S:
-                    return (False, Rotation.W)
-                case Rotation.W:
-                    return (False, Rotation.S)
-                case _:
-                    raise ValueError(f"Invalid laser rotation {laser_rotation}")
-        else:
+        if piece_rotation not in SCARAB_REFLECTIONS:
             raise ValueError(f"Scarab can only have rotation of NW or NE, this scarab is {piece_rotation}")
+        return lookup_hit(PieceType.SCARAB, laser_rotation, piece_rotation)
     
 
+# (sphinx square, current rotation) -> the one rotation the sphinx can turn to
+SPHINX_ROTATIONS = {
+    ## Upper Sphinx
+    (0, Rotation.S.value): Rotation.E.value,
+    (0, Rotation.E.value): Rotation.S.value,
+    ## Lower Sphinx
+    (79, Rotation.N.value): Rotation.W.value,
+    (79, Rotation.W.value): Rotation.N.value,
+}
+
 class Sphinx(Piece):
     @staticmethod
     def get_moves(board, position) -> List[Tuple[Tuple[int, int], Rotation]]:
         assert board.get_piece(position) == PieceType.SPHINX
-        curr_rotation = board.get_rotation(position)
-
-        ## Upper Sphinx
-        if position == (0, 0):
-            if curr_rotation == Rotation.S:
-                return [Move(position, Rotation.E, False)]
-            elif curr_rotation == Rotation.E:
-                return [Move(position, Rotation.S, False)]
-        ## Lower Sphinx
-        elif position == (7, 9):
-            if curr_rotation == Rotation.N:
-                return [Move(position, Rotation.W, False)]
-            elif curr_rotation == Rotation.W:
-                return [Move(position, Rotation.N, False)]
-        else:
-            raise ValueError(f"Sphinx can only be in position (0, 0) or (7, 9). This sphinx position is {position}")
+
+        return [unpack_move(packed_move)[1] for packed_move in Sphinx.get_packed_moves(board.squares, position[0] * 10 + position[1])]
+
+    @staticmethod
+    def get_packed_moves(squares, idx) -> List[int]:
+        if idx != 0 and idx != 79:
+            raise ValueError(f"Sphinx can only be in position (0, 0) or (7, 9). This sphinx position is {POSITIONS[idx]}")
+        new_rotation = SPHINX_ROTATIONS.get((idx, squares[idx] & ROTATION_MASK))
+        if new_rotation is None:
+            return []
+        return [idx | (idx << TO_SHIFT) | (new_rotation << ROTATION_SHIFT)]
         
     @staticmethod
     def hit(laser_rotation, piece_rotation) -> Tuple[bool, Optional[Rotation]]:
-        return False, None
+        return lookup_hit(PieceType.SPHINX, laser_rotation, piece_rotation)
             
 
 class Anubis(Piece):
@@ -181,10 +279,7 @@ class Anubis(Piece):
         """
         If laser comes from 180 degrees of the piece rotation is blocked, otherwise it is hit
         """
-        if turn_180(piece_rotation) == laser_rotation:
-            return False, None
-        else:
-            return True, None
+        return lookup_hit(PieceType.ANUBIS, laser_rotation, piece_rotation)
     
 class Pharoah(Piece):
     @staticmethod
@@ -193,10 +288,15 @@ class Pharoah(Piece):
 
         # only allow the Pharoah to move since turning doesn't do anything
         return [move for move in Piece.get_moves(board, position) if not move.is_position_new]
+
+    @staticmethod
+    def get_packed_moves(squares, idx) -> List[int]:
+        # The two rotations always come first
+        return Piece.get_packed_moves(squares, idx)[:2]
     
     @staticmethod
     def hit(laser_rotation, piece_rotation) -> Tuple[bool, Optional[Rotation]]:
-        return True, None
+        return lookup_hit(PieceType.PHAROAH, laser_rotation, piece_rotation)
 
 class Pyramid(Piece):
     @staticmethod
@@ -213,67 +313,16 @@ class Pyramid(Piece):
         SE: N->E, W->S, S->hit, E->hit
         SW: N->W, E->S, S->hit, W->hit
         """
-        if piece_rotation == Rotation.NE:
-            match laser_rotation:
-                case Rotation.S:
-                    return (False, Rotation.E)
-                case Rotation.W:
-                    return (False, Rotation.N)
-                case Rotation.N:
-                    return (True, None)
-                case Rotation.E:
-                    return (True, None)
-                case _:
-                    raise ValueError(f"Invalid laser rotation {laser_rotation}")
-        elif piece_rotation == Rotation.NW:
-            match laser_rotation:
-                case Rotation.S:
-                    return (False, Rotation.W)
-                case Rotation.E:
-                    return (False, Rotation.N)
-                case Rotation.N:
-                    return (True, None)
-                case Rotation.W:
-                    return (True, None)
-                case _:
-                    raise ValueError(f"Invalid laser rotation {laser_rotation}")
-        elif piece_rotation == Rotation.SE:
-            match laser_rotation:
-                case Rotation.N:
-                    return (False, Rotation.E)
-                case Rotation.W:
-                    return (False, Rotation.S)
-                case Rotation.S:
-                    return (True, None)
-                case Rotation.E:
-                    return (True, None)
-                case _:
-                    raise ValueError(f"Invalid laser rotation {laser_rotation}")
-        elif piece_rotation == Rotation.SW:
-            match laser_rotation:
-                case Rotation.N:
-                    return (False, Rotation.W)
-                case Rotation.E:
-                    return (False, Rotation.S)
-                case Rotation.S:
-                    return (True, None)
-                case Rotation.W:
-                    return (True, None)
-                case _:
-                    raise ValueError(f"Invalid laser rotation {laser_rotation}")
-        else:
+        if piece_rotation not in PYRAMID_REFLECTIONS:
             raise ValueError(f"Pyramid can only have rotation of NW, NE, SW, or SE, this pyramid is {piece_rotation}")
-        
+        return lookup_hit(PieceType.PYRAMID, laser_rotation, piece_rotation)
+
+# Piece classes indexed by PieceType value
+PIECE_CLASSES = [None, Pharoah, Scarab, Pyramid, Anubis, Sphinx]
+# Packed move generators indexed by PieceType value, called with (squares, square index)
+PACKED_MOVE_GENERATORS = [None] + [piece_class.get_packed_moves for piece_class in PIECE_CLASSES[1:]]
+
 def get_piece_from_piece_type(piece_type):
-    if piece_type == PieceType.ANUBIS:
-        return Anubis
-    elif piece_type == PieceType.PHAROAH:
-        return Pharoah
-    elif piece_type == PieceType.PYRAMID:
-        return Pyramid
-    elif piece_type == PieceType.SCARAB:
-        return Scarab
-    elif piece_type == PieceType.SPHINX:
-        return Sphinx
-    else:
-        raise ValueError(f"Invalid piece type {piece_type}")
\ No newline at end of file
+    if piece_type == PieceType.NONE:
+        raise ValueError(f"Invalid piece type {piece_type}")
+    return PIECE_CLASSES[piece_type.value]
@@ -0,0 +1,171 @@
+import json
+from operator import mul
+
+import numpy as np
+
+from batch_laser import fire_lasers
+from board import N_SQUARES
+from evaluation import Evaluator
+from pieces import (NEIGHBOURS, PHAROAH_CODE, PIECE_SHIFT, ROTATION_MASK, SILVER_BIT, SPHINX_CODE, TRANSLATE_MOVES,
+                    PieceColor, PieceType)
+from threats import laser_path_mask
+
+# Positional features, each Red's count minus Silver's, so a position and its mirror (see Board.mirrored) have
+# opposite features:
+#   pharoahs: 1 when only Red has its Pharoah, -1 when only Silver has it. Nonzero only once the game is won, so
+#       a move that eliminates a Pharoah scores as a win when siblings are compared (e.g. for the beam)
+#   pyramids, scarabs, anubises: pieces left of each type
+#   pharoah_exposure: squares next to the side's Pharoah that the opponent's laser passes over. One move of a
+#       reflector there can turn the laser onto the Pharoah
+#   laser_reach: squares the side's laser passes over (see threats.laser_path_mask)
+#   laser_control: pieces of the side on its own laser path, which it can move to steer the laser
+#   mobility: empty squares next to each piece of the side, a cheap stand-in for its number of moves
+# Sphinxes don't count for laser_control and mobility, they never move
+FEATURES = ("pharoahs", "pyramids", "scarabs", "anubises", "pharoah_exposure", "laser_reach", "laser_control",
+            "mobility")
+# Hand-set starting weights, in hundredths of a pyramid
+DEFAULT_WEIGHTS = {
+    # Far above any other score, and still below game_tree.WIN_THRESHOLD so it never reads as a searched win
+    "pharoahs": 50000,
+    "pyramids": 100,
+    "scarabs": 300,
+    "anubises": 200,
+    "pharoah_exposure": -30,
+    "laser_reach": 2,
+    "laser_control": 10,
+    "mobility": 3,
+}
+
+_MATERIAL_CODES = [piece.value << PIECE_SHIFT
+                   for piece in (PieceType.PHAROAH, PieceType.PYRAMID, PieceType.SCARAB, PieceType.ANUBIS)]
+
+# Square code -> code without its rotation, as a bytes.translate table
+_KIND_TABLE = bytes(code & ~ROTATION_MASK for code in range(256))
+
+def _movers_table(silver) -> bytes:
+    """
+    Square code -> 1 for the pieces of a color that can move (everything but the sphinx), 0 otherwise
+    """
+    return bytes(int(1 <= code >> PIECE_SHIFT <= 5 and bool(code & SILVER_BIT) == silver
+                     and code & ~(SILVER_BIT | ROTATION_MASK) != SPHINX_CODE) for code in range(256))
+
+_RED_MOVERS_TABLE = _movers_table(False)
+_SILVER_MOVERS_TABLE = _movers_table(True)
+_RED_MOVERS_ARRAY = np.frombuffer(_RED_MOVERS_TABLE, dtype=np.uint8)
+_SILVER_MOVERS_ARRAY = np.frombuffer(_SILVER_MOVERS_TABLE, dtype=np.uint8)
+
+FULL_MASK = (1 << N_SQUARES) - 1
+# Bitboard of the squares next to each square
+NEIGHBOUR_MASKS = [sum(1 << neighbour for neighbour in neighbours) for neighbours in NEIGHBOURS]
+# NEIGHBOUR_MATRIX[i, j] is 1 when j is next to i. float32 so products with it go through BLAS, exact for counts
+NEIGHBOUR_MATRIX = np.zeros((N_SQUARES, N_SQUARES), dtype=np.float32)
+for _idx, _neighbours in enumerate(NEIGHBOURS):
+    NEIGHBOUR_MATRIX[_idx, list(_neighbours)] = 1
+# (index shift, squares that have a neighbour that way) for each of the 8 steps, to move a whole bitboard one step
+_NEIGHBOUR_SHIFTS = [(dr * 10 + dc, sum(1 << (r * 10 + c) for r in range(8) for c in range(10)
+                                        if 0 <= r + dr < 8 and 0 <= c + dc < 10))
+                     for dr, dc in TRANSLATE_MOVES]
+
+def _bitboard(squares, table) -> int:
+    return int.from_bytes(np.packbits(np.frombuffer(squares.translate(table), dtype=np.uint8),
+                                      bitorder="little").tobytes(), "little")
+
+def _mobility(movers, empty) -> int:
+    mobility = 0
+    for shift, has_neighbour in _NEIGHBOUR_SHIFTS:
+        sources = movers & has_neighbour
+        mobility += ((sources << shift if shift > 0 else sources >> -shift) & empty).bit_count()
+    return mobility
+
+def board_features(board) -> list:
+    """
+    FEATURES of one board, in order. Works on bitboards, so it is cheap enough to call at every node
+    """
+    squares = board.squares
+    kinds = squares.translate(_KIND_TABLE)
+    features = [kinds.count(code) - kinds.count(code | SILVER_BIT) for code in _MATERIAL_CODES]
+
+    red_path = laser_path_mask(board, PieceColor.RED)
+    silver_path = laser_path_mask(board, PieceColor.SILVER)
+    red_pharoah = kinds.find(PHAROAH_CODE)
+    silver_pharoah = kinds.find(PHAROAH_CODE | SILVER_BIT)
+    red_exposure = (NEIGHBOUR_MASKS[red_pharoah] & silver_path).bit_count() if red_pharoah >= 0 else 0
+    silver_exposure = (NEIGHBOUR_MASKS[silver_pharoah] & red_path).bit_count() if silver_pharoah >= 0 else 0
+    features.append(red_exposure - silver_exposure)
+    features.append(red_path.bit_count() - silver_path.bit_count())
+
+    red_movers = _bitboard(squares, _RED_MOVERS_TABLE)
+    silver_movers = _bitboard(squares, _SILVER_MOVERS_TABLE)
+    features.append((red_movers & red_path).bit_count() - (silver_movers & silver_path).bit_count())
+    empty = ~board.occupancy & FULL_MASK
+    features.append(_mobility(red_movers, empty) - _mobility(silver_movers, empty))
+    return features
+
+def _pharoah_area(kinds, code) -> np.ndarray:
+    """
+    (N, N_SQUARES) bool array of the squares next to the Pharoah with code (rotation cleared) on each board of kinds,
+    all False where it is gone
+    """
+    pharoahs = kinds == code
+    return NEIGHBOUR_MATRIX[pharoahs.argmax(axis=1)].astype(bool) & pharoahs.any(axis=1)[:, None]
+
+def stack_features(stack) -> np.ndarray:
+    """
+    (N, len(FEATURES)) int array of the FEATURES of every board in a stack of square codes, (N, 8, 10) or
+    (N, N_SQUARES). Everything is computed for all boards at once, the laser paths with batch_laser.fire_lasers
+    """
+    flat = np.asarray(stack, dtype=np.uint8).reshape(-1, N_SQUARES)
+    n_boards = len(flat)
+    kinds = flat & np.uint8(~ROTATION_MASK & 0xFF)
+    features = np.empty((n_boards, len(FEATURES)), dtype=np.int64)
+    for i, code in enumerate(_MATERIAL_CODES):
+        features[:, i] = (kinds == code).sum(axis=1) - (kinds == code | SILVER_BIT).sum(axis=1)
+
+    red_path = np.zeros((n_boards, N_SQUARES), dtype=bool)
+    silver_path = np.zeros((n_boards, N_SQUARES), dtype=bool)
+    if n_boards:
+        fire_lasers(flat, PieceColor.RED, out_paths=red_path)
+        fire_lasers(flat, PieceColor.SILVER, out_paths=silver_path)
+    features[:, 4] = (_pharoah_area(kinds, PHAROAH_CODE) & silver_path).sum(axis=1)
+    features[:, 4] -= (_pharoah_area(kinds, PHAROAH_CODE | SILVER_BIT) & red_path).sum(axis=1)
+    features[:, 5] = red_path.sum(axis=1) - silver_path.sum(axis=1)
+
+    red_movers = _RED_MOVERS_ARRAY[flat]
+    silver_movers = _SILVER_MOVERS_ARRAY[flat]
+    features[:, 6] = (red_movers * red_path).sum(axis=1) - (silver_movers * silver_path).sum(axis=1)
+    # Movers next to each empty square, summed over the empty squares
+    empty = flat == 0
+    movers = red_movers.astype(np.float32) - silver_movers
+    features[:, 7] = ((movers @ NEIGHBOUR_MATRIX) * empty).sum(axis=1)
+    return features
+
+class PositionalEvaluator(Evaluator):
+    """
+    Weighted sum of FEATURES. weights: {feature: weight}, DEFAULT_WEIGHTS for the ones left out.
+    Scores are rounded to whole numbers, in the units of the weights
+    """
+    def __init__(self, weights=None):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        unknown = set(self.weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features {sorted(unknown)}, expected some of {FEATURES}")
+        self.weight_list = [self.weights[name] for name in FEATURES]
+        self.weight_array = np.array(self.weight_list, dtype=np.float64)
+
+    @staticmethod
+    def load(path) -> "PositionalEvaluator":
+        """
+        Evaluator with the weights of a JSON file written by save (or tune.py)
+        """
+        with open(path) as f:
+            return PositionalEvaluator(json.load(f))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.weights, f, indent=2)
+
+    def evaluate(self, board) -> int:
+        return round(sum(map(mul, board_features(board), self.weight_list)))
+
+    def evaluate_batch(self, stack) -> np.ndarray:
+        return np.rint(stack_features(stack) @ self.weight_array).astype(np.int64)
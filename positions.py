@@ -0,0 +1,118 @@
+from board import Board
+from pieces import PieceColor, PieceType, Rotation
+
+# row, col, piece, color, rotation of the classic setup. from_config_list also places the 180 degree mirror of
+# every entry, which for this symmetric setup is another entry of the list
+CLASSIC_CONFIG = [
+    (0, 0, PieceType.SPHINX, PieceColor.RED, Rotation.S),
+    (0, 4, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+    (0, 5, PieceType.PHAROAH, PieceColor.RED, Rotation.S),
+    (0, 6, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+    (0, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+    (1, 2, PieceType.PYRAMID, PieceColor.RED, Rotation.SW),
+    (3, 0, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+    (3, 4, PieceType.SCARAB, PieceColor.RED, Rotation.NE),
+    (3, 5, PieceType.SCARAB, PieceColor.RED, Rotation.NW),
+    (3, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+    (4, 0, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+    (4, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+    (5, 6, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+    (7, 9, PieceType.SPHINX, PieceColor.SILVER, Rotation.N),
+    (7, 5, PieceType.ANUBIS, PieceColor.SILVER, Rotation.N),
+    (7, 4, PieceType.PHAROAH, PieceColor.SILVER, Rotation.N),
+    (7, 3, PieceType.ANUBIS, PieceColor.SILVER, Rotation.N),
+    (7, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+    (6, 7, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+    (4, 9, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+    (4, 5, PieceType.SCARAB, PieceColor.SILVER, Rotation.NE),
+    (4, 4, PieceType.SCARAB, PieceColor.SILVER, Rotation.NW),
+    (4, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+    (3, 9, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+    (3, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+    (2, 3, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SE),
+]
+
+def initialize_classic_board():
+    return Board.from_config_list(CLASSIC_CONFIG)
+
+# Fixed mid-game positions as (row, col, piece, color, rotation) for every piece, Red to move.
+# Reached by seeded random play from the classic setup
+MIDGAME_POSITIONS = {
+    "midgame_16": [
+        (0, 0, PieceType.SPHINX, PieceColor.RED, Rotation.S),
+        (0, 3, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+        (0, 4, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+        (0, 5, PieceType.PHAROAH, PieceColor.RED, Rotation.S),
+        (0, 6, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+        (0, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+        (2, 3, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NE),
+        (2, 5, PieceType.SCARAB, PieceColor.RED, Rotation.NW),
+        (2, 9, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+        (3, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+        (3, 5, PieceType.SCARAB, PieceColor.RED, Rotation.NW),
+        (4, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+        (4, 4, PieceType.SCARAB, PieceColor.SILVER, Rotation.NW),
+        (4, 5, PieceType.SCARAB, PieceColor.SILVER, Rotation.NE),
+        (4, 9, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+        (6, 6, PieceType.PYRAMID, PieceColor.RED, Rotation.NW),
+        (7, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NE),
+        (7, 3, PieceType.ANUBIS, PieceColor.SILVER, Rotation.N),
+        (7, 4, PieceType.PHAROAH, PieceColor.SILVER, Rotation.W),
+        (7, 9, PieceType.SPHINX, PieceColor.SILVER, Rotation.N),
+    ],
+    "midgame_30": [
+        (0, 0, PieceType.SPHINX, PieceColor.RED, Rotation.S),
+        (0, 2, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+        (0, 5, PieceType.PHAROAH, PieceColor.RED, Rotation.S),
+        (0, 6, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+        (0, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+        (1, 1, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+        (1, 3, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+        (2, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SE),
+        (2, 3, PieceType.SCARAB, PieceColor.RED, Rotation.NE),
+        (3, 2, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SE),
+        (4, 4, PieceType.SCARAB, PieceColor.SILVER, Rotation.NW),
+        (4, 5, PieceType.SCARAB, PieceColor.SILVER, Rotation.NE),
+        (4, 8, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+        (5, 0, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+        (5, 5, PieceType.SCARAB, PieceColor.RED, Rotation.NE),
+        (6, 2, PieceType.ANUBIS, PieceColor.SILVER, Rotation.N),
+        (7, 4, PieceType.PHAROAH, PieceColor.SILVER, Rotation.N),
+        (7, 5, PieceType.ANUBIS, PieceColor.SILVER, Rotation.N),
+        (7, 9, PieceType.SPHINX, PieceColor.SILVER, Rotation.N),
+    ],
+    "midgame_50": [
+        (0, 0, PieceType.SPHINX, PieceColor.RED, Rotation.S),
+        (0, 3, PieceType.ANUBIS, PieceColor.RED, Rotation.N),
+        (0, 4, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+        (0, 5, PieceType.PHAROAH, PieceColor.RED, Rotation.S),
+        (0, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.NW),
+        (1, 3, PieceType.ANUBIS, PieceColor.RED, Rotation.S),
+        (2, 2, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+        (2, 3, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SE),
+        (2, 4, PieceType.SCARAB, PieceColor.RED, Rotation.NE),
+        (3, 1, PieceType.PYRAMID, PieceColor.RED, Rotation.NW),
+        (3, 3, PieceType.SCARAB, PieceColor.SILVER, Rotation.NW),
+        (3, 4, PieceType.ANUBIS, PieceColor.SILVER, Rotation.N),
+        (3, 5, PieceType.SCARAB, PieceColor.RED, Rotation.NW),
+        (3, 6, PieceType.SCARAB, PieceColor.SILVER, Rotation.NW),
+        (3, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.SW),
+        (3, 9, PieceType.PYRAMID, PieceColor.RED, Rotation.SE),
+        (4, 1, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+        (4, 7, PieceType.PYRAMID, PieceColor.RED, Rotation.NE),
+        (4, 9, PieceType.PYRAMID, PieceColor.SILVER, Rotation.SW),
+        (6, 3, PieceType.PYRAMID, PieceColor.SILVER, Rotation.NW),
+        (7, 4, PieceType.PHAROAH, PieceColor.SILVER, Rotation.W),
+        (7, 7, PieceType.ANUBIS, PieceColor.SILVER, Rotation.W),
+        (7, 9, PieceType.SPHINX, PieceColor.SILVER, Rotation.N),
+    ],
+}
+
+def get_benchmark_positions():
+    """
+    name -> Board for the classic start and the fixed mid-game positions
+    """
+    positions = {"classic": initialize_classic_board()}
+    for name, piece_list in MIDGAME_POSITIONS.items():
+        positions[name] = Board.from_piece_list(piece_list, PieceColor.RED)
+    return positions
@@ -0,0 +1,116 @@
+import cProfile
+import io
+import pstats
+import time
+from collections import Counter, defaultdict
+
+# Functions listed in the profile section of a report
+PROFILE_TOP_N = 20
+
+class SearchStats:
+    """
+    Opt-in counters for one search at a time. Pass an instance to GameTree(stats=...) and read report() or
+    SearchResult.stats after each search. Without one the search only pays for a few `is None` checks.
+    Counters:
+        nodes_by_ply: positions searched at each ply from the root
+        moves_generated / moves_searched: moves generated for ordering and moves actually made in the search.
+            The difference is what alpha-beta and the beam skipped
+        beta_cutoffs: nodes whose remaining moves were skipped because a move reached beta
+        beam_pruned: moves dropped by GameTree.beam_width before the search
+        tt_probes / tt_hits / tt_cutoffs: transposition table lookups, lookups that found the position and
+            lookups whose stored score ended the node
+        threat_wins: nodes ended by a win in one found by the threat analysis
+        quiescence_nodes: positions searched below the horizon by the quiescence search
+        laser_traces / laser_steps: lasers fired in make_move and the straight segments they travelled
+        phase_times: seconds spent in move ordering, make_move, unmake_move and evaluation
+    profile: also run cProfile over each search, kept in profile_stats and summarised in the report
+    """
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.profile_stats = None
+        self.reset()
+
+    def reset(self):
+        self.nodes_by_ply = Counter()
+        self.moves_generated = 0
+        self.moves_searched = 0
+        self.beta_cutoffs = 0
+        self.beam_pruned = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.threat_wins = 0
+        self.quiescence_nodes = 0
+        self.laser_traces = 0
+        self.laser_steps = 0
+        self.phase_times = defaultdict(float)
+        self.elapsed = 0.0
+        self._start = None
+        self._profiler = None
+
+    def start(self):
+        """
+        Called by GameTree.search before it starts. Clears the counters of the previous search
+        """
+        self.reset()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile_stats = pstats.Stats(self._profiler, stream=io.StringIO())
+            self._profiler = None
+
+    def report(self) -> dict:
+        """
+        Counters of the last search as a JSON-friendly dict
+        """
+        max_ply = max(self.nodes_by_ply, default=-1)
+        nodes = sum(self.nodes_by_ply.values())
+        report = {
+            "nodes": nodes,
+            "nodes_by_ply": [self.nodes_by_ply[ply] for ply in range(max_ply + 1)],
+            "moves_generated": self.moves_generated,
+            "moves_searched": self.moves_searched,
+            "beta_cutoffs": self.beta_cutoffs,
+            "beam_pruned": self.beam_pruned,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_cutoffs": self.tt_cutoffs,
+            "threat_wins": self.threat_wins,
+            "quiescence_nodes": self.quiescence_nodes,
+            "laser_traces": self.laser_traces,
+            "laser_steps": self.laser_steps,
+            "laser_steps_per_trace": self.laser_steps / self.laser_traces if self.laser_traces else 0.0,
+            "seconds": self.elapsed,
+            "phase_seconds": dict(self.phase_times),
+            "nodes_per_second": nodes / self.elapsed if self.elapsed else None,
+        }
+        if self.profile_stats is not None:
+            report["profile"] = self.profile_summary()
+        return report
+
+    def profile_summary(self, top_n=PROFILE_TOP_N):
+        """
+        The top_n functions of the last profiled search by cumulative time
+        """
+        if self.profile_stats is None:
+            return []
+        entries = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in self.profile_stats.stats.items():
+            entries.append({"function": f"{filename}:{line}({name})", "calls": calls,
+                            "tottime": tottime, "cumtime": cumtime})
+        entries.sort(key=lambda entry: entry["cumtime"], reverse=True)
+        return entries[:top_n]
+
+    def dump_profile(self, path):
+        """
+        Write the last search's profile in pstats format (for snakeviz, pstats.Stats(path), ...)
+        """
+        if self.profile_stats is None:
+            raise ValueError("No profile captured, create SearchStats with profile=True")
+        self.profile_stats.dump_stats(path)
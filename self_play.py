@@ -0,0 +1,173 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional
+
+from game_tree import GameTree
+from notation import RECORD_BYTES, decode_board, encode_board, iter_positions
+from parallel_search import imap_unordered
+from pieces import PHAROAH_CODE, ROTATION_MASK, SILVER_BIT, PieceColor
+from positional_evaluation import PositionalEvaluator
+from positions import initialize_classic_board
+
+# Game file layout: MAGIC, then one record per game: GAME_HEADER_FORMAT (winner, plies, nodes, seconds), the start
+# position (notation.encode_board) and the plies as little-endian uint32 packed moves.
+# winner is the PieceColor value of the winner, 0 for a draw
+MAGIC = b"LCGAMES1"
+GAME_HEADER_FORMAT = "<bHQd"
+GAME_HEADER_BYTES = struct.calcsize(GAME_HEADER_FORMAT)
+DRAW = 0
+# A position seen this many times in a game ends it in a draw
+REPETITIONS_FOR_DRAW = 3
+
+@dataclass
+class GameRecord:
+    # notation.encode_board of the start position
+    start: bytes
+    # Packed moves of the game, in order
+    moves: List[int] = field(default_factory=list)
+    # PieceColor value of the winner, DRAW if the game was drawn or cut off
+    winner: int = DRAW
+    # Nodes searched and seconds taken by both sides
+    nodes: int = 0
+    seconds: float = 0.0
+
+    def to_bytes(self) -> bytes:
+        return (struct.pack(GAME_HEADER_FORMAT, self.winner, len(self.moves), self.nodes, self.seconds) + self.start
+                + struct.pack(f"<{len(self.moves)}I", *self.moves))
+
+    @staticmethod
+    def read(f: BinaryIO) -> Optional["GameRecord"]:
+        """
+        Read the next record from f, None at the end of the file
+        """
+        header = f.read(GAME_HEADER_BYTES)
+        if not header:
+            return None
+        if len(header) != GAME_HEADER_BYTES:
+            raise ValueError("Truncated game record")
+        winner, n_plies, nodes, seconds = struct.unpack(GAME_HEADER_FORMAT, header)
+        start = f.read(RECORD_BYTES)
+        moves = f.read(4 * n_plies)
+        if len(start) != RECORD_BYTES or len(moves) != 4 * n_plies:
+            raise ValueError("Truncated game record")
+        return GameRecord(start, list(struct.unpack(f"<{n_plies}I", moves)), winner, nodes, seconds)
+
+def play_game(board, depth=None, time_per_move=None, max_plies=200, random_plies=0, seed=0, **tree_kwargs) -> GameRecord:
+    """
+    Play board out with the search on both sides. The first random_plies moves are picked at random (seeded with
+    seed) so games from the same start differ. The game ends when a Pharoah is eliminated, a position repeats
+    REPETITIONS_FOR_DRAW times, a side has no moves or after max_plies plies.
+    depth and time_per_move limit every search (see GameTree.search)
+    """
+    board = board.copy()
+    record = GameRecord(encode_board(board))
+    rng = random.Random(seed)
+    tree = GameTree(**tree_kwargs)
+    seen = Counter([board.hash])
+    start = time.perf_counter()
+    for ply in range(max_plies):
+        if ply < random_plies:
+            moves = board.generate_moves()
+            move = rng.choice(moves) if moves else None
+        else:
+            result = tree.search(board, depth, time_limit=time_per_move)
+            record.nodes += result.nodes
+            move = result.pv[0] if result.pv else None
+        if move is None:
+            break
+
+        tree.advance_root(board, move)
+        eliminated_code = board.make_packed_move(move)
+        record.moves.append(move)
+        if eliminated_code & ~(SILVER_BIT | ROTATION_MASK) == PHAROAH_CODE:
+            record.winner = PieceColor.RED.value if eliminated_code & SILVER_BIT else PieceColor.SILVER.value
+            break
+        seen[board.hash] += 1
+        if seen[board.hash] >= REPETITIONS_FOR_DRAW:
+            break
+    record.seconds = time.perf_counter() - start
+    return record
+
+def _play_game_task(task) -> bytes:
+    """
+    Worker: play one game from an encoded start position and return its encoded record
+    """
+    start, seed, play_kwargs = task
+    return play_game(decode_board(start), seed=seed, **play_kwargs).to_bytes()
+
+def generate_games(path, n_games, start_positions=None, workers=None, seed=0, verbose=False, **play_kwargs) -> Counter:
+    """
+    Play n_games games across worker processes and append each record to the game file at path as soon as it
+    is finished. Game i starts from start_positions[i % len(start_positions)] (the classic setup by default) with
+    seed + i as its random seed.
+    workers: number of processes, os.cpu_count() by default. With 1 everything runs in this process.
+    play_kwargs: passed on to play_game (depth, time_per_move, max_plies, random_plies and GameTree arguments).
+    Returns how many games each side won, keyed by winner
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    starts = [encode_board(board) for board in (start_positions or [initialize_classic_board()])]
+    tasks = ((starts[i % len(starts)], seed + i, play_kwargs) for i in range(n_games))
+    results = Counter()
+
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(MAGIC)
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            if executor is None:
+                records = map(_play_game_task, tasks)
+            else:
+                records = imap_unordered(executor, _play_game_task, tasks, 2 * workers)
+            for n_played, record in enumerate(records, 1):
+                f.write(record)
+                f.flush()
+                results[struct.unpack_from(GAME_HEADER_FORMAT, record)[0]] += 1
+                if verbose:
+                    print(f"{n_played}/{n_games} games, red {results[PieceColor.RED.value]} "
+                          f"silver {results[PieceColor.SILVER.value]} draws {results[DRAW]}", file=sys.stderr)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    return results
+
+def read_games(path) -> Iterator[GameRecord]:
+    """
+    GameRecords of a game file, one at a time
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game file")
+        for record in iter(lambda: GameRecord.read(f), None):
+            yield record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine vs engine games and append them to a game file")
+    parser.add_argument("output", help="game file to append to")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, help="worker processes, one per CPU by default")
+    parser.add_argument("--depth", type=int, help="search depth per move, GameTree's default without a time limit")
+    parser.add_argument("--time-per-move", type=float, help="search time limit per move in seconds")
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--random-plies", type=int, default=2, help="random moves at the start of each game")
+    parser.add_argument("--positions", help="start positions file (see notation.iter_positions), classic by default")
+    parser.add_argument("--weights", help="positional evaluation weights (see tune.py), material only by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    tree_kwargs = {"evaluator": PositionalEvaluator.load(args.weights)} if args.weights else {}
+    start_positions = list(iter_positions(args.positions)) if args.positions else None
+    results = generate_games(args.output, args.games, start_positions, args.workers, args.seed, args.verbose,
+                             depth=args.depth, time_per_move=args.time_per_move, max_plies=args.max_plies,
+                             random_plies=args.random_plies, **tree_kwargs)
+    print(f"Red {results[PieceColor.RED.value]} Silver {results[PieceColor.SILVER.value]} Draws {results[DRAW]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+from notation import to_notation
+from positions import initialize_classic_board
+
+ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.py")
+
+def run_engine(commands, timeout=30):
+    """
+    Pipe commands into an engine process and return its output lines. Fails if it doesn't quit within timeout
+    """
+    process = subprocess.run([sys.executable, ENGINE], input="".join(f"{command}\n" for command in commands),
+                             capture_output=True, text=True, timeout=timeout)
+    assert process.returncode == 0, process.stderr
+    return process.stdout.splitlines()
+
+def test_command_during_go_waits_for_bestmove_without_hanging_on_ponder():
+    # d arrives before the bestmove, while pondering is on
+    lines = run_engine(["position startpos", "go depth 2", "d", "go depth 1", "quit"])
+    bestmoves = [i for i, line in enumerate(lines) if line.startswith("bestmove")]
+    position = next(i for i, line in enumerate(lines) if line.startswith("info string"))
+    assert len(bestmoves) == 2
+    assert bestmoves[0] < position < bestmoves[1]
+
+def test_invalid_rotation_is_an_error_line():
+    # A scarab facing N
+    text = to_notation(initialize_classic_board()).replace("S1", "S0", 1)
+    lines = run_engine([f"position notation {text}", "go depth 1", "quit"])
+    assert lines[0].startswith("info string error:")
+    assert lines[-1].startswith("bestmove") and lines[-1] != "bestmove (none)"
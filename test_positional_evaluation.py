@@ -0,0 +1,49 @@
+import random
+
+from game_tree import GameTree
+from pieces import PHAROAH_CODE, ROTATION_MASK, SILVER_BIT
+from positional_evaluation import PositionalEvaluator, board_features, stack_features
+from positions import get_benchmark_positions
+from threats import pharoah_kills
+
+def one_move_wins(n_games=40, seed=5):
+    """
+    (board, winning moves) for positions with a win in one, from seeded random games on the benchmark positions
+    """
+    rng = random.Random(seed)
+    wins = []
+    for start in get_benchmark_positions().values():
+        for _ in range(n_games):
+            board = start.copy()
+            for _ in range(rng.randrange(2, 40)):
+                moves = board.generate_moves()
+                if not moves:
+                    break
+                eliminated_code = board.make_packed_move(rng.choice(moves))
+                if eliminated_code & ~(SILVER_BIT | ROTATION_MASK) == PHAROAH_CODE:
+                    # Stop before a Pharoah is gone
+                    board.unmake_move()
+                    break
+            kills = pharoah_kills(board, board.next_turn)
+            if kills:
+                wins.append((board.copy(), kills))
+    return wins
+
+def test_beam_search_keeps_one_move_wins():
+    wins = one_move_wins()
+    assert wins
+    tree = GameTree(1, beam_width=3, evaluator=PositionalEvaluator(), tt_memory_mb=0)
+    for board, kills in wins:
+        assert tree.search(board).pv[0] in kills
+
+def test_batch_matches_single_board_after_a_pharoah_is_gone():
+    evaluator = PositionalEvaluator()
+    for board, _ in one_move_wins()[:3]:
+        moves, stack = board.get_child_stack()
+        scores = evaluator.evaluate_batch(stack)
+        features = stack_features(stack)
+        for move, score, board_row in zip(moves, scores, features):
+            board.make_packed_move(move)
+            assert evaluator.evaluate(board) == score
+            assert board_features(board) == board_row.tolist()
+            board.unmake_move()
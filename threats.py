@@ -0,0 +1,111 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from board import RAY_INCREASING, RAY_MASKS, RED_LASER_SQUARE, SILVER_LASER_SQUARE
+from pieces import (ELIMINATED, NO_DIRECTION, PHAROAH_CODE, PIECE_SHIFT, REFLECTION_TABLE, ROTATION_MASK, SILVER_BIT,
+                    SQUARE_MASK, TO_SHIFT, PieceColor)
+
+def laser_path_mask(board, color) -> int:
+    """
+    Bitboard of the squares the laser of color passes over, from its sphinx up to the square where it is blocked or
+    eliminates a piece, or to the edge of the board
+    """
+    squares = board.squares
+    occupancy = board.occupancy
+    idx = RED_LASER_SQUARE if color == PieceColor.RED else SILVER_LASER_SQUARE
+    direction = squares[idx] & ROTATION_MASK
+    mask = 1 << idx
+    while True:
+        ray = RAY_MASKS[direction][idx]
+        hits = ray & occupancy
+        if not hits:
+            return mask | ray
+        hit_idx = (hits & -hits).bit_length() - 1 if RAY_INCREASING[direction] else hits.bit_length() - 1
+        # The ray up to and including the hit square
+        mask |= ray & ~RAY_MASKS[direction][hit_idx]
+        idx = hit_idx
+
+        code = squares[idx]
+        outcome = REFLECTION_TABLE[code >> PIECE_SHIFT][code & ROTATION_MASK][direction]
+        if outcome is None or outcome[0] == ELIMINATED or outcome[1] == NO_DIRECTION:
+            return mask
+        direction = outcome[1]
+
+def touches(move, mask) -> bool:
+    """
+    True if move starts or ends on a square of mask
+    """
+    return bool((mask >> (move & SQUARE_MASK)) & 1 or (mask >> ((move >> TO_SHIFT) & SQUARE_MASK)) & 1)
+
+def pharoah_kills(board, color, path_mask=None, moves=None) -> List[int]:
+    """
+    Packed moves color could play that make its laser eliminate the other side's Pharoah. color doesn't need to be
+    the side to move, moves are its moves if they are already generated.
+    Only moves that start or end on the laser's path (path_mask, see laser_path_mask) can change what it hits, so
+    only those are played out. All the others hit what the laser hits now
+    """
+    next_turn = board.next_turn
+    board.next_turn = color
+    try:
+        if moves is None:
+            moves = board.generate_moves()
+        if path_mask is None:
+            path_mask = laser_path_mask(board, color)
+        opponent_pharoah = PHAROAH_CODE | (0 if color == PieceColor.SILVER else SILVER_BIT)
+        hit_idx = board._fire_laser(color)
+        kills_now = hit_idx is not None and board.squares[hit_idx] & ~ROTATION_MASK == opponent_pharoah
+
+        kills = []
+        for move in moves:
+            if (path_mask >> (move & SQUARE_MASK)) & 1 or (path_mask >> ((move >> TO_SHIFT) & SQUARE_MASK)) & 1:
+                if board.peek_laser(move) & ~ROTATION_MASK == opponent_pharoah:
+                    kills.append(move)
+            elif kills_now:
+                kills.append(move)
+        return kills
+    finally:
+        board.next_turn = next_turn
+
+@dataclass
+class ThreatMap:
+    # Squares each laser passes over now (see laser_path_mask)
+    red_path: int
+    silver_path: int
+    side_to_move: PieceColor
+    # Moves of the side to move that eliminate the opponent's Pharoah: a win in one
+    winning_moves: List[int] = field(default_factory=list)
+    # Moves of the opponent that would eliminate the Pharoah of the side to move if it was the opponent's turn now
+    threats: List[int] = field(default_factory=list)
+
+    @property
+    def must_block(self) -> bool:
+        """
+        True when the opponent threatens to win and the side to move can't win first
+        """
+        return bool(self.threats) and not self.winning_moves
+
+    @property
+    def block_mask(self) -> int:
+        """
+        Squares where a move of the side to move may stop the threats: the opponent's laser path and the squares
+        the threatening moves start and end on
+        """
+        mask = self.silver_path if self.side_to_move == PieceColor.RED else self.red_path
+        for move in self.threats:
+            mask |= (1 << (move & SQUARE_MASK)) | (1 << ((move >> TO_SHIFT) & SQUARE_MASK))
+        return mask
+
+def analyze_threats(board, threats=True, moves=None) -> ThreatMap:
+    """
+    ThreatMap of board. threats=False leaves out the opponent's winning moves. moves are the side to move's moves
+    if they are already generated
+    """
+    color = board.next_turn
+    opponent = PieceColor.SILVER if color == PieceColor.RED else PieceColor.RED
+    red_path = laser_path_mask(board, PieceColor.RED)
+    silver_path = laser_path_mask(board, PieceColor.SILVER)
+    own_path, opponent_path = (red_path, silver_path) if color == PieceColor.RED else (silver_path, red_path)
+    threat_map = ThreatMap(red_path, silver_path, color, pharoah_kills(board, color, own_path, moves))
+    if threats and not threat_map.winning_moves:
+        threat_map.threats = pharoah_kills(board, opponent, opponent_path)
+    return threat_map
@@ -0,0 +1,68 @@
+import sys
+from typing import Optional, Tuple
+
+# Bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1 # score is at least the stored value (beta cutoff)
+UPPER_BOUND = 2 # score is at most the stored value (no move raised alpha)
+
+def _allocated_bytes(obj) -> int:
+    # CPython's small-object allocator hands out memory in 16-byte steps
+    return -(-sys.getsizeof(obj) // 16) * 16
+
+# Size of one full entry at its largest: the list slot, the 6-tuple, a 64-bit key and a score and best move that
+# are too big for CPython's cached small ints. Depth and bound are always cached, and all entries of a search share
+# one generation int
+ENTRY_BYTES = 8 + sum(map(_allocated_bytes, ((0,) * 6, 2**64 - 1, -100000, 1 << 17)))
+
+class TranspositionTable:
+    """
+    Fixed-capacity hash table of search results keyed by Board.hash.
+    Each key maps to one slot (key % capacity). A slot is replaced when it is empty, holds an
+    entry from an older search or holds an entry searched to at most the new depth.
+    """
+    def __init__(self, memory_mb=64):
+        """
+        memory_mb: cap on the memory of the table when every slot holds an entry, from ENTRY_BYTES
+        """
+        self.capacity = max(1, int(memory_mb * 2**20) // ENTRY_BYTES)
+        # Entries are (key, depth, score, bound, best_move, generation) or None
+        self.entries = [None] * self.capacity
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """
+        Age the stored entries so they are replaced before entries from the new search
+        """
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.capacity
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def probe(self, key) -> Optional[Tuple[int, int, int, Optional[int]]]:
+        """
+        Returns (depth, score, bound, best_move) stored for key, None if there is none
+        """
+        entry = self.entries[key % self.capacity]
+        if entry is None or entry[0] != key:
+            return None
+        self.hits += 1
+        return entry[1], entry[2], entry[3], entry[4]
+
+    def store(self, key, depth, score, bound, best_move):
+        idx = key % self.capacity
+        entry = self.entries[idx]
+        if entry is None or entry[5] != self.generation or entry[0] == key or depth >= entry[1]:
+            if entry is not None and entry[0] == key and best_move is None:
+                # Keep the known best move when the new result doesn't have one
+                best_move = entry[4]
+            self.entries[idx] = (key, depth, score, bound, best_move, self.generation)
+            self.stores += 1
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.entries)
@@ -0,0 +1,154 @@
+import argparse
+import math
+import sys
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from board import N_SQUARES
+from notation import decode_board
+from pieces import PHAROAH_CODE, ROTATION_MASK, SILVER_BIT
+from positional_evaluation import FEATURES, PositionalEvaluator, stack_features
+from self_play import read_games
+
+# A score s (Red's point of view) predicts Red's result as 1 / (1 + 10 ** (-s / SCORE_SCALE)): with weights in
+# hundredths of a pyramid, being SCORE_SCALE ahead makes Red about 10 times as likely to win as to lose
+SCORE_SCALE = 400
+_K = math.log(10) / SCORE_SCALE
+
+def game_positions(paths: Iterable[str], skip_plies=0, batch_size=1 << 16) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Positions of the self-play game files at paths, labelled with the result of their game for Red (1 win,
+    0.5 draw, 0 loss). Every position a move was played from counts, except the first skip_plies of each game.
+    Yields (squares, results) batches: an (n, N_SQUARES) uint8 array of square codes and n float32 results
+    """
+    squares = np.empty((batch_size, N_SQUARES), dtype=np.uint8)
+    results = np.empty(batch_size, dtype=np.float32)
+    n = 0
+    for path in paths:
+        for record in read_games(path):
+            board = decode_board(record.start)
+            # PieceColor.RED is -1 and SILVER 1, DRAW is 0
+            result = (1 - record.winner) / 2
+            for ply, move in enumerate(record.moves):
+                if ply >= skip_plies:
+                    squares[n] = np.frombuffer(board.squares, dtype=np.uint8)
+                    results[n] = result
+                    n += 1
+                    if n == batch_size:
+                        yield squares.copy(), results.copy()
+                        n = 0
+                eliminated_code = board.make_packed_move(move)
+                if eliminated_code & ~(SILVER_BIT | ROTATION_MASK) == PHAROAH_CODE:
+                    break
+    if n:
+        yield squares[:n].copy(), results[:n].copy()
+
+def load_features(paths, skip_plies=0, batch_size=1 << 16, verbose=False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (features, results) of every position of game_positions: an (N, len(FEATURES)) float32 array computed
+    batch_size positions at a time with stack_features, and the N results. Only the features are kept, so
+    millions of positions fit in memory
+    """
+    features, results = [], []
+    n_positions = 0
+    start = time.perf_counter()
+    for squares, batch_results in game_positions(paths, skip_plies, batch_size):
+        features.append(stack_features(squares).astype(np.float32))
+        results.append(batch_results)
+        n_positions += len(squares)
+        if verbose:
+            print(f"{n_positions} positions, {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if not features:
+        return np.zeros((0, len(FEATURES)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.concatenate(features), np.concatenate(results)
+
+def expected_results(features, weights) -> np.ndarray:
+    """
+    Red's expected result of every position from its features and a weight array in FEATURES order
+    """
+    return 1 / (1 + np.exp(-_K * (features @ weights)))
+
+def loss(features, results, weights) -> float:
+    """
+    Mean squared error between the expected and the actual results
+    """
+    if not len(results):
+        return 0.0
+    return float(np.mean((expected_results(features, weights) - results) ** 2))
+
+def tune(features, results, weights: Optional[dict] = None, epochs=20, batch_size=1 << 14, learning_rate=1.0,
+         fixed=(), seed=0, verbose=False) -> dict:
+    """
+    Fit the feature weights to the results by minimizing loss with Adam over shuffled mini-batches, each one a
+    handful of array operations for all its positions.
+    weights: starting weights, PositionalEvaluator's defaults for the ones left out
+    learning_rate: step size, in the units of the weights
+    fixed: features whose weight is kept, e.g. "pyramids" to anchor the scale of the scores. Recorded positions
+        all have both Pharoahs, so "pharoahs" gets no gradient either way.
+    Returns the tuned {feature: weight}
+    """
+    w = PositionalEvaluator(weights).weight_array.copy()
+    trainable = np.array([name not in fixed for name in FEATURES], dtype=np.float64)
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+    step = 0
+    for epoch in range(epochs):
+        order = rng.permutation(len(results))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            x, y = features[batch], results[batch]
+            p = expected_results(x, w)
+            # d loss / d weights, through the logistic
+            gradient = x.T.astype(np.float64) @ (2 * (p - y) * p * (1 - p) * _K) / len(batch) * trainable
+            step += 1
+            m = beta1 * m + (1 - beta1) * gradient
+            v = beta2 * v + (1 - beta2) * gradient ** 2
+            w -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+        if verbose:
+            print(f"epoch {epoch + 1}: loss {loss(features, results, w):.6f}", file=sys.stderr)
+    return {name: float(weight) for name, weight in zip(FEATURES, w)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the positional evaluation weights on self-play games")
+    parser.add_argument("games", nargs="+", help="game files written by self_play.py")
+    parser.add_argument("--output", default="weights.json", help="JSON file for the tuned weights")
+    parser.add_argument("--weights", help="starting weights (JSON), the defaults otherwise")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1 << 14)
+    parser.add_argument("--learning-rate", type=float, default=1.0)
+    parser.add_argument("--skip-plies", type=int, default=0, help="leave out the first plies of every game")
+    parser.add_argument("--validation", type=float, default=0.1, help="fraction of positions held out")
+    parser.add_argument("--fixed", nargs="*", default=["pharoahs", "pyramids"],
+                        help="features whose weight is not tuned")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    features, results = load_features(args.games, args.skip_plies, verbose=args.verbose)
+    if not len(results):
+        parser.error("No positions in the game files")
+    order = np.random.default_rng(args.seed).permutation(len(results))
+    n_validation = int(len(order) * args.validation)
+    train, validation = order[n_validation:], order[:n_validation]
+
+    start_weights = PositionalEvaluator.load(args.weights).weights if args.weights else None
+    before = PositionalEvaluator(start_weights).weight_array
+    weights = tune(features[train], results[train], start_weights, args.epochs, args.batch_size, args.learning_rate,
+                   args.fixed, args.seed, args.verbose)
+    after = PositionalEvaluator(weights).weight_array
+    print(f"{len(train)} training and {len(validation)} validation positions")
+    print(f"Training loss {loss(features[train], results[train], before):.6f} -> "
+          f"{loss(features[train], results[train], after):.6f}")
+    if len(validation):
+        print(f"Validation loss {loss(features[validation], results[validation], before):.6f} -> "
+              f"{loss(features[validation], results[validation], after):.6f}")
+    for name in FEATURES:
+        print(f"  {name}: {weights[name]:.2f}")
+    PositionalEvaluator(weights).save(args.output)
+
+if __name__ == "__main__":
+    main()